@@ -0,0 +1,385 @@
+# project owner: Johannes Siedersleben
+#
+# =============================================================================
+# ArrayStepfun: Columnar, NumPy-Backed Step Functions
+#
+# `ArrayStepfun` is a columnar companion to the tuple-based step functions in
+# `stepfun.py`. It holds the same mathematical object - a right-continuous
+# step function on the whole real line - in two contiguous NumPy arrays:
+#
+#   _times:  float64, strictly ascending, _times[0] == -inf (the None timestamp)
+#   _values: float64 or bool, _values[i] is the value on [_times[i], _times[i+1])
+#
+# A step function with a million breakpoints takes 16 MB instead of hundreds
+# of MB of Python tuples, and all work is done by vectorized array operations:
+#
+#   - construction/normalization: stable sort, dedupe (last value wins) and
+#     merging of equal neighbours via argsort and boolean masks
+#   - evaluation: numpy.searchsorted
+#   - arithmetic: the union of breakpoints (numpy.unique), both operands
+#     evaluated there by searchsorted, one ufunc call, one normalization
+#   - integrate and comparisons: dot products and reductions over the arrays
+#
+# Values are restricted to float64 and bool. There is no Excel-style
+# propagation of non-numeric values; IEEE semantics apply instead (x / 0 is
+# inf or nan, and nan compares false). Use `from_stepfun` / `to_stepfun` to
+# convert from and to `NumericStepfun` / `BoolStepfun`.
+#
+# Usage Overview:
+# ---------------
+#     f = ArrayStepfun([(None, 1.0), (2, 5.0), (5, 3.0)])
+#     g = ArrayStepfun.from_arrays(times, values)       # vectorized fast path
+#     h = ArrayStepfun.sum(f, g, ...)
+#     ys = h.evaluate_many(xs)
+#     total = h.integrate(0, 10)
+#     sf = h.to_stepfun()                               # NumericStepfun
+#     h.save(path); h2 = ArrayStepfun.load(path)        # memory-mapped (storage.py)
+# =============================================================================
+
+import functools
+from array import array
+from typing import Iterable, Tuple, Any, Union
+
+import numpy as np
+
+from sandbox.stepfunctions.stepfun import AbstractStepfun, NumericStepfun, BoolStepfun, TvPair, Timestamp, \
+    _FLOAT_EXACT
+
+
+class ArrayStepfun:
+    """
+    Step function with float64 or bool values, stored as two contiguous arrays
+    (breakpoints and values) in canonical form. Immutable.
+    """
+    __slots__ = ('_times', '_values')
+
+    _times: np.ndarray
+    _values: np.ndarray
+
+    def __init__(self, tv_list: Union[Iterable[TvPair], AbstractStepfun, 'ArrayStepfun']):
+        if isinstance(tv_list, ArrayStepfun):
+            self._times, self._values = tv_list._times, tv_list._values
+            return
+        if isinstance(tv_list, AbstractStepfun):
+            if not isinstance(tv_list._times, array):
+                raise ValueError("Timestamps beyond the precision of float64 cannot be converted.")
+            tv_list = tv_list.tv_list
+        times, values = [], []
+        for pair in tv_list:
+            if not (isinstance(pair, tuple) and len(pair) == 2):
+                raise TypeError("Each tv-pair must be a tuple (timestamp, value).")
+            t, v = pair
+            if t is None or t == "-oo":
+                t = float('-inf')
+            if not isinstance(t, (int, float)):
+                raise TypeError("Timestamps must be int, float, None, or '-oo'.")
+            if isinstance(t, int) and abs(t) > _FLOAT_EXACT:
+                # Would collapse with its neighbours in float64 and lose segments
+                raise ValueError("Timestamps beyond the precision of float64 cannot be converted.")
+            times.append(t)
+            values.append(v)
+        if not times:
+            raise ValueError("tv_list must not be empty.")
+        if all(isinstance(v, bool) for v in values):
+            dtype = bool
+        elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            dtype = np.float64
+        else:
+            raise TypeError("ArrayStepfun values must be all bool or all numeric.")
+        self._times, self._values = self._normalize(np.array(times, dtype=np.float64),
+                                                    np.array(values, dtype=dtype))
+
+    @classmethod
+    def from_arrays(cls, times, values) -> 'ArrayStepfun':
+        """
+        Vectorized constructor from an array of breakpoints (-inf for None) and an
+        array of values (bool, or anything castable to float64). Normalizes like __init__.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values)
+        if values.dtype != bool:
+            values = values.astype(np.float64)
+        if times.ndim != 1 or times.shape != values.shape:
+            raise ValueError("times and values must be 1-d arrays of equal length.")
+        if not len(times):
+            raise ValueError("tv_list must not be empty.")
+        return cls._from_canonical(*cls._normalize(times, values))
+
+    @classmethod
+    def _from_canonical(cls, times: np.ndarray, values: np.ndarray) -> 'ArrayStepfun':
+        # Trusted constructor: times/values are already in canonical form
+        obj = cls.__new__(cls)
+        obj._times, obj._values = times, values
+        return obj
+
+    @staticmethod
+    def _normalize(times: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Stable sort, so the last of several values for one timestamp wins
+        order = np.argsort(times, kind='stable')
+        times, values = times[order], values[order]
+        first_value = values[:1]
+        # Keep only the last value for duplicate timestamps
+        last = np.empty(len(times), dtype=bool)
+        last[:-1] = times[1:] != times[:-1]
+        last[-1] = True
+        times, values = times[last], values[last]
+        # If the first timestamp isn't -inf, insert (-inf, value) with the first value
+        if times[0] != -np.inf:
+            times = np.concatenate(([-np.inf], times))
+            values = np.concatenate((first_value, values))
+        return ArrayStepfun._merge_equal(times, values)
+
+    @staticmethod
+    def _merge_equal(times: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Merge consecutive intervals with the same value
+        keep = np.empty(len(values), dtype=bool)
+        keep[0] = True
+        np.not_equal(values[1:], values[:-1], out=keep[1:])
+        if keep.all():
+            return times, values
+        return times[keep], values[keep]
+
+    @classmethod
+    def from_stepfun(cls, f: AbstractStepfun) -> 'ArrayStepfun':
+        return cls(f)
+
+    def to_stepfun(self) -> AbstractStepfun:
+        """Converts to a NumericStepfun (float values) or BoolStepfun (bool values)."""
+        if self._values.dtype == bool:
+            return BoolStepfun._from_canonical(self.tv_list)
+        return NumericStepfun._from_canonical(self.tv_list)
+
+    def save(self, path) -> None:
+        """Writes the step function to path in the binary format of storage.py."""
+        from sandbox.stepfunctions import storage
+        storage.save(self, path)
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> 'ArrayStepfun':
+        """Opens a file written by save; with mmap the arrays are read-only memory maps."""
+        from sandbox.stepfunctions import storage
+        return storage.load(path, mmap)
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @property
+    def tv_list(self) -> Tuple[TvPair, ...]:
+        times = self._times.tolist()
+        times[0] = None
+        return tuple(zip(times, self._values.tolist()))
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def __repr__(self) -> str:
+        return f"ArrayStepfun({self.tv_list})"
+
+    def __str__(self) -> str:
+        return f"ArrayStepfun{self.tv_list}"
+
+    # --- Evaluation ---
+
+    def __call__(self, x: Timestamp) -> Any:
+        idx = int(np.searchsorted(self._times, x, side='right')) - 1
+        return self._values[max(idx, 0)].item()
+
+    def evaluate_many(self, xs) -> np.ndarray:
+        idx = np.searchsorted(self._times, np.asarray(xs, dtype=np.float64), side='right') - 1
+        np.maximum(idx, 0, out=idx)
+        return self._values[idx]
+
+    # --- Windows ---
+
+    def restrict(self, a: Timestamp = None, b: Timestamp = None, fill: Any = None) -> 'ArrayStepfun':
+        """
+        Returns the step function equal to self on [a, b) and fill elsewhere (None for a
+        or b: no bound on that side). fill defaults to nan; bool step functions need an
+        explicit bool fill. Two searchsorted calls locate the window, the k breakpoints
+        inside are copied as one block: O(log n + k).
+        """
+        if fill is None:
+            if self._values.dtype == bool:
+                raise ValueError("Restricting a bool step function requires a bool fill.")
+            fill = np.nan
+        fill = np.array([fill], dtype=self._values.dtype)
+        times, values = self._times, self._values
+        if a is not None and b is not None and a >= b:
+            return ArrayStepfun._from_canonical(np.array([-np.inf]), fill)
+        t_parts, v_parts = [], []
+        if a is None:
+            lo = 0
+        else:
+            lo = int(np.searchsorted(times, a, side='right'))
+            t_parts += [[-np.inf], [a]]
+            v_parts += [fill, values[lo - 1:lo]]
+        hi = len(times) if b is None else int(np.searchsorted(times, b, side='left'))
+        t_parts.append(times[lo:hi])
+        v_parts.append(values[lo:hi])
+        if b is not None:
+            t_parts.append([b])
+            v_parts.append(fill)
+        return ArrayStepfun._from_canonical(*ArrayStepfun._merge_equal(
+            np.concatenate(t_parts).astype(np.float64, copy=False), np.concatenate(v_parts)))
+
+    def __getitem__(self, window: slice) -> 'ArrayStepfun':
+        """f[a:b] is f.restrict(a, b)."""
+        if not isinstance(window, slice) or window.step is not None:
+            raise TypeError("Step functions support window slicing f[a:b] only.")
+        return self.restrict(window.start, window.stop)
+
+    # --- N-ary combination ---
+
+    @staticmethod
+    def _union_values(fs) -> Tuple[np.ndarray, list]:
+        # Union of all breakpoints, and every operand's values on the union's intervals
+        times = np.unique(np.concatenate([f._times for f in fs]))
+        return times, [f.evaluate_many(times) for f in fs]
+
+    @staticmethod
+    def _combine(fs, ufunc, dtype=np.float64) -> 'ArrayStepfun':
+        """
+        Combine several ArrayStepfuns by merging their breakpoints and applying a
+        binary ufunc left to right, all vectorized. All operands must have values
+        of the given dtype (float64 for arithmetic, bool for logical operations).
+        """
+        if not fs:
+            raise ValueError("At least one step function required.")
+        if any(f._values.dtype != dtype for f in fs):
+            raise TypeError(f"Operation requires {np.dtype(dtype).name} values.")
+        times, columns = ArrayStepfun._union_values(fs)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            values = functools.reduce(ufunc, columns)
+        return ArrayStepfun._from_canonical(*ArrayStepfun._merge_equal(times, values))
+
+    def _map(self, ufunc) -> 'ArrayStepfun':
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            values = ufunc(self._values)
+        return ArrayStepfun._from_canonical(*ArrayStepfun._merge_equal(self._times, values))
+
+    @staticmethod
+    def sum(*fs: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine(fs, np.add)
+
+    @staticmethod
+    def multiply(*fs: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine(fs, np.multiply)
+
+    @staticmethod
+    def logical_and(*fs: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine(fs, np.logical_and, bool)
+
+    @staticmethod
+    def logical_or(*fs: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine(fs, np.logical_or, bool)
+
+    @staticmethod
+    def minimum(*fs: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine(fs, np.minimum)
+
+    @staticmethod
+    def maximum(*fs: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine(fs, np.maximum)
+
+    def map(self, ufunc) -> 'ArrayStepfun':
+        """
+        Applies a vectorized function (ufunc-like) to the value array in one call.
+        The result must have one value per interval; non-bool results become float64.
+        """
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            values = np.asarray(ufunc(self._values))
+        if values.shape != self._values.shape:
+            raise ValueError("map requires one value per interval.")
+        if values.dtype != bool:
+            values = values.astype(np.float64, copy=False)
+        return ArrayStepfun._from_canonical(*ArrayStepfun._merge_equal(self._times, values))
+
+    def clip(self, lo: float = None, hi: float = None) -> 'ArrayStepfun':
+        """Limits the values to [lo, hi]; None means no bound on that side."""
+        if self._values.dtype == bool:
+            raise TypeError("clip requires float64 values.")
+        if lo is not None and hi is not None and lo > hi:
+            raise ValueError("lo must be <= hi.")
+        return self._map(lambda v: np.clip(v, lo, hi))
+
+    def __add__(self, other: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine([self, other], np.add)
+
+    def __sub__(self, other: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine([self, other], np.subtract)
+
+    def __mul__(self, other: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine([self, other], np.multiply)
+
+    def __truediv__(self, other: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine([self, other], np.true_divide)
+
+    def __neg__(self) -> 'ArrayStepfun':
+        return self._map(np.negative)
+
+    def __abs__(self) -> 'ArrayStepfun':
+        return self._map(np.absolute)
+
+    def __and__(self, other: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine([self, other], np.logical_and, bool)
+
+    def __or__(self, other: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine([self, other], np.logical_or, bool)
+
+    def __xor__(self, other: 'ArrayStepfun') -> 'ArrayStepfun':
+        return ArrayStepfun._combine([self, other], np.logical_xor, bool)
+
+    def __invert__(self) -> 'ArrayStepfun':
+        return self._map(np.logical_not)
+
+    # --- Integration ---
+
+    def integrate(self, start: Timestamp, end: Timestamp) -> float:
+        if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
+            raise ValueError("Integration bounds must be numbers.")
+        if start > end:
+            raise ValueError("Start must be <= end.")
+        if start == end:
+            return 0.0
+        times = self._times
+        lo = int(np.searchsorted(times, start, side='right'))
+        hi = int(np.searchsorted(times, end, side='left'))
+        points = np.concatenate(([start], times[lo:hi], [end]))
+        return float(np.dot(np.diff(points), self._values[lo - 1:hi]))
+
+    # --- Comparisons: pointwise, True iff all intervals satisfy the comparison ---
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ArrayStepfun):
+            return NotImplemented
+        # Canonical form is unique: equal functions have equal arrays
+        return (self._values.dtype == other._values.dtype
+                and np.array_equal(self._times, other._times)
+                and np.array_equal(self._values, other._values))
+
+    def __ne__(self, other: Any) -> bool:
+        eq = self.__eq__(other)
+        if eq is NotImplemented:
+            return NotImplemented
+        return not eq
+
+    def _compare(self, other: 'ArrayStepfun', ufunc) -> bool:
+        _, (a, b) = ArrayStepfun._union_values([self, other])
+        return bool(np.all(ufunc(a, b)))
+
+    def __lt__(self, other: 'ArrayStepfun') -> bool:
+        return self._compare(other, np.less)
+
+    def __le__(self, other: 'ArrayStepfun') -> bool:
+        return self._compare(other, np.less_equal)
+
+    def __gt__(self, other: 'ArrayStepfun') -> bool:
+        return self._compare(other, np.greater)
+
+    def __ge__(self, other: 'ArrayStepfun') -> bool:
+        return self._compare(other, np.greater_equal)
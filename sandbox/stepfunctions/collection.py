@@ -0,0 +1,139 @@
+# project owner: Johannes Siedersleben
+#
+# =============================================================================
+# StepfunCollection: Many Step Functions in One Columnar Store
+#
+# A catalog of many step functions keyed by entity id, stored column-wise:
+#
+#   _times:   float64, the breakpoints of all functions, concatenated
+#   _values:  float64 or bool, the corresponding values, concatenated
+#   _offsets: int64, function i occupies _times[_offsets[i]:_offsets[i+1]]
+#
+# Each segment is the canonical form of one function (ascending, starting
+# with -inf), exactly as in `ArrayStepfun`. Queries across all functions
+# never loop over Python objects: a segmented binary search runs one
+# vectorized bisection step for all segments (and query points) at once, so
+# a cross-section of m functions at one point costs O(log n) NumPy calls on
+# arrays of size m, where n is the length of the longest function.
+#
+#   - `at(t)`:        value of every function at t (cross-section)
+#   - `panel(ts)`:    values of every function at t1..tk, an (m, k) array
+#   - `sum_at(t)`:    sum across functions at t (scalar t or array ts)
+#   - `coll[key]`:    one function as a zero-copy ArrayStepfun view
+#
+# Values follow `ArrayStepfun`: all float64 or all bool, IEEE semantics.
+#
+# Usage Overview:
+# ---------------
+#     coll = StepfunCollection({"a": f, "b": g, ...})   # any step functions
+#     coll.at(3.5)                                      # array, one value per key
+#     coll.panel([1, 2, 3])                             # shape (len(coll), 3)
+#     coll.sum_at(3.5)
+#     coll["a"](3.5)
+# =============================================================================
+
+from typing import Any, Hashable, Iterable, Iterator, List, Mapping, Tuple, Union
+
+import numpy as np
+
+from sandbox.stepfunctions.stepfun import AbstractStepfun, Timestamp
+from sandbox.stepfunctions.arraystepfun import ArrayStepfun
+
+Stepfun = Union[AbstractStepfun, ArrayStepfun]
+
+
+class StepfunCollection:
+    """
+    Immutable keyed collection of step functions in one columnar layout (concatenated
+    breakpoints and values plus offsets); see the module comment.
+    """
+    __slots__ = ('_keys', '_index', '_times', '_values', '_offsets')
+
+    def __init__(self, items: Union[Mapping[Hashable, Stepfun], Iterable[Tuple[Hashable, Stepfun]]]):
+        if isinstance(items, Mapping):
+            items = items.items()
+        keys, arrays = [], []
+        for key, f in items:
+            keys.append(key)
+            try:
+                arrays.append(ArrayStepfun(f))
+            except ValueError as e:
+                # e.g. int timestamps beyond 2**53, which float64 cannot hold exactly
+                raise ValueError(f"{key!r}: {e}") from e
+        self._keys: List[Hashable] = keys
+        self._index = {key: i for i, key in enumerate(keys)}
+        if len(self._index) != len(keys):
+            raise ValueError("Keys must be unique.")
+        if len({a.values.dtype == bool for a in arrays}) > 1:
+            raise TypeError("StepfunCollection values must be all bool or all numeric.")
+        lengths = [len(a) for a in arrays]
+        self._offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self._offsets[1:])
+        if arrays:
+            self._times = np.concatenate([a.times for a in arrays])
+            self._values = np.concatenate([a.values for a in arrays])
+        else:
+            self._times = np.empty(0, dtype=np.float64)
+            self._values = np.empty(0, dtype=np.float64)
+
+    # --- Container protocol ---
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    @property
+    def keys(self) -> List[Hashable]:
+        return list(self._keys)
+
+    def __getitem__(self, key: Hashable) -> ArrayStepfun:
+        # A view: the arrays are slices of the shared columns
+        i = self._index[key]
+        lo, hi = self._offsets[i], self._offsets[i + 1]
+        return ArrayStepfun._from_canonical(self._times[lo:hi], self._values[lo:hi])
+
+    def __repr__(self) -> str:
+        return f"StepfunCollection({len(self)} functions, {len(self._times)} breakpoints)"
+
+    # --- Queries ---
+
+    def _search(self, ts: np.ndarray) -> np.ndarray:
+        """
+        Segmented binary search: for every function i and query point ts[j], the index
+        into the shared columns of the interval containing ts[j]. Returns shape (m, k).
+        """
+        starts = self._offsets[:-1, None]
+        lo = np.broadcast_to(starts, (len(self), len(ts))).copy()
+        hi = np.broadcast_to(self._offsets[1:, None], lo.shape).copy()
+        longest = int(np.max(np.diff(self._offsets), initial=0))
+        last = max(len(self._times) - 1, 0)
+        for _ in range(longest.bit_length()):
+            mid = (lo + hi) >> 1
+            active = lo < hi
+            right = active & (self._times[np.minimum(mid, last)] <= ts)
+            lo = np.where(right, mid + 1, lo)
+            hi = np.where(active & ~right, mid, hi)
+        # Every segment starts with -inf, so lo > start unless t is nan
+        return np.maximum(lo - 1, starts)
+
+    def at(self, t: Timestamp) -> np.ndarray:
+        """Values of all functions at t, in key order."""
+        return self.panel([t])[:, 0]
+
+    def panel(self, ts: Iterable[Timestamp]) -> np.ndarray:
+        """Values of all functions at all points ts: an array of shape (len(self), len(ts))."""
+        ts = np.asarray(ts, dtype=np.float64)
+        if ts.ndim != 1:
+            raise ValueError("ts must be a 1-d sequence of points.")
+        return self._values[self._search(ts)]
+
+    def sum_at(self, t: Union[Timestamp, Iterable[Timestamp]]) -> Any:
+        """Sum across all functions at t (a float), or at each of several points (an array)."""
+        if np.ndim(t) == 0:
+            return self.at(t).sum().item()
+        return self.panel(t).sum(axis=0)
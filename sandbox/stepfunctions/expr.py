@@ -0,0 +1,203 @@
+# project owner: Johannes Siedersleben
+#
+# =============================================================================
+# StepfunExpr: Fused Evaluation of Step Function Formulas
+#
+# Every binary operator on `NumericStepfun` runs its own merge: a formula
+# like `(a + b) * c - d / e` makes 5 passes over the breakpoints, allocates 4
+# intermediate step functions and normalizes 5 times. `StepfunExpr` records
+# the operator tree instead and evaluates it in a single pass:
+#
+#   1. `compile()` turns the tree into one Python closure that maps the
+#      current values of the distinct leaves to the value of the formula.
+#      A step function occurring several times in the formula is one leaf.
+#   2. `materialize()` runs one heap-based k-way sweep over the union of the
+#      leaves' breakpoints (`AbstractStepfun._sweep`) and calls the closure
+#      once per breakpoint; equal neighbours are merged on the fly.
+#
+# The result is exactly what the chained operators would give, including
+# Excel-style propagation of non-numeric values and "DIV/0" for x / 0.
+# Numbers (int, float) may be used as constant operands. Note that Python
+# evaluates `a / b` on two plain step functions eagerly; wrap one operand
+# (`StepfunExpr(a) / b` or `a / StepfunExpr(b)`) to have an operator recorded.
+#
+# Usage Overview:
+# ---------------
+#     e = (StepfunExpr(a) + b) * c - StepfunExpr(d) / e
+#     e(3.5)                         # evaluates the formula at a point
+#     f = e.materialize()            # NumericStepfun, one sweep
+# =============================================================================
+
+import operator
+from typing import Any, Callable, Sequence, Tuple, Union
+
+from sandbox.stepfunctions.stepfun import AbstractStepfun, NumericStepfun, Timestamp
+
+
+def _is_number(x) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _excel(op: Callable) -> Callable:
+    # Binary op with Excel-style propagation: the first non-numeric operand is the result
+    def apply(x, y):
+        if not _is_number(x):
+            return x
+        if not _is_number(y):
+            return y
+        return op(x, y)
+
+    return apply
+
+
+def _div(x, y):
+    if y == 0:
+        return "DIV/0"
+    return x / y
+
+
+_BINARY = {
+    '+': _excel(operator.add),
+    '-': _excel(operator.sub),
+    '*': _excel(operator.mul),
+    '/': _excel(_div),
+}
+
+_UNARY = {
+    'neg': lambda v: -v if _is_number(v) else v,
+    'abs': lambda v: abs(v) if _is_number(v) else v,
+}
+
+Operand = Union['StepfunExpr', NumericStepfun, int, float]
+
+
+class StepfunExpr:
+    """
+    Operator tree over NumericStepfuns and numeric constants, evaluated in one
+    sweep by materialize(); see the module comment.
+    A node is a leaf (op None, args (NumericStepfun,)), a constant (op 'const',
+    args (number,)), or an operator ('+', '-', '*', '/', 'neg', 'abs') over sub-expressions.
+    """
+    __slots__ = ('_op', '_args')
+
+    def __init__(self, f: Operand):
+        if isinstance(f, StepfunExpr):
+            self._op, self._args = f._op, f._args
+        elif isinstance(f, NumericStepfun):
+            self._op, self._args = None, (f,)
+        elif _is_number(f):
+            self._op, self._args = 'const', (f,)
+        else:
+            raise TypeError("StepfunExpr operands must be NumericStepfun, StepfunExpr or numbers.")
+
+    @classmethod
+    def _node(cls, op: str, *args: Operand) -> 'StepfunExpr':
+        obj = cls.__new__(cls)
+        obj._op, obj._args = op, tuple(StepfunExpr(a) for a in args)
+        return obj
+
+    # --- Recording ---
+
+    def __add__(self, other: Operand) -> 'StepfunExpr':
+        return StepfunExpr._node('+', self, other)
+
+    def __radd__(self, other: Operand) -> 'StepfunExpr':
+        return StepfunExpr._node('+', other, self)
+
+    def __sub__(self, other: Operand) -> 'StepfunExpr':
+        return StepfunExpr._node('-', self, other)
+
+    def __rsub__(self, other: Operand) -> 'StepfunExpr':
+        return StepfunExpr._node('-', other, self)
+
+    def __mul__(self, other: Operand) -> 'StepfunExpr':
+        return StepfunExpr._node('*', self, other)
+
+    def __rmul__(self, other: Operand) -> 'StepfunExpr':
+        return StepfunExpr._node('*', other, self)
+
+    def __truediv__(self, other: Operand) -> 'StepfunExpr':
+        return StepfunExpr._node('/', self, other)
+
+    def __rtruediv__(self, other: Operand) -> 'StepfunExpr':
+        return StepfunExpr._node('/', other, self)
+
+    def __neg__(self) -> 'StepfunExpr':
+        return StepfunExpr._node('neg', self)
+
+    def __abs__(self) -> 'StepfunExpr':
+        return StepfunExpr._node('abs', self)
+
+    # --- Compilation ---
+
+    @property
+    def leaves(self) -> Tuple[NumericStepfun, ...]:
+        """The distinct step functions of the formula (by identity), in order of occurrence."""
+        seen = {}
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._op is None:
+                seen.setdefault(id(node._args[0]), node._args[0])
+            elif node._op != 'const':
+                stack.extend(reversed(node._args))
+        return tuple(seen.values())
+
+    def compile(self) -> Tuple[Tuple[NumericStepfun, ...], Callable[[Sequence[Any]], Any]]:
+        """
+        Returns (leaves, fn): fn maps the current values of the leaves (a sequence in
+        the order of leaves) to the value of the formula.
+        """
+        leaves = self.leaves
+        index = {id(f): i for i, f in enumerate(leaves)}
+        return leaves, self._compile(index)
+
+    def _compile(self, index: dict) -> Callable[[Sequence[Any]], Any]:
+        op, args = self._op, self._args
+        if op is None:
+            return operator.itemgetter(index[id(args[0])])
+        if op == 'const':
+            c = args[0]
+            return lambda vs: c
+        if op in _UNARY:
+            fn, arg = _UNARY[op], args[0]._compile(index)
+            return lambda vs: fn(arg(vs))
+        fn, left, right = _BINARY[op], args[0]._compile(index), args[1]._compile(index)
+        return lambda vs: fn(left(vs), right(vs))
+
+    # --- Evaluation ---
+
+    def __call__(self, x: Timestamp) -> Any:
+        leaves, fn = self.compile()
+        return fn([f(x) for f in leaves])
+
+    def materialize(self) -> NumericStepfun:
+        """Evaluates the formula in a single sweep over the union of the leaves' breakpoints."""
+        leaves, fn = self.compile()
+        if not leaves:
+            return NumericStepfun([(None, fn(()))])
+        result = []
+        for t, current, _ in AbstractStepfun._sweep(leaves):
+            v = fn(current)
+            if not result or result[-1][1] != v:
+                result.append((t, v))
+        return NumericStepfun._from_canonical(tuple(result))
+
+    def __str__(self) -> str:
+        index = {id(f): i for i, f in enumerate(self.leaves)}
+        return self._format(index)
+
+    def _format(self, index: dict) -> str:
+        op, args = self._op, self._args
+        if op is None:
+            return f"f{index[id(args[0])]}"
+        if op == 'const':
+            return repr(args[0])
+        if op == 'neg':
+            return f"-{args[0]._format(index)}"
+        if op == 'abs':
+            return f"abs({args[0]._format(index)})"
+        return f"({args[0]._format(index)} {op} {args[1]._format(index)})"
+
+    def __repr__(self) -> str:
+        return f"StepfunExpr({self})"
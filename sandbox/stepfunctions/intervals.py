@@ -38,6 +38,8 @@
 #      - unary `-` for complement
 #    Bulk operations for N-ary union/intersection are supported via static
 #    methods (`Intervals.union(*args)`, `Intervals.intersection(*args)`).
+#    Both are special cases of `Intervals.at_least(k, *args)`, the points
+#    covered by at least k of the sets, computed by one counting sweep.
 #
 # 4. **Comparisons and Subsets:**
 #    All six comparison operators are implemented as subset/superset/equality
@@ -48,7 +50,12 @@
 #    You can test whether a real number x is in the set by calling the instance
 #    as a function: `A(x)` returns `True` if x is in any of the intervals. The
 #    `.intervals` property always returns the canonical, sorted list of
-#    non-overlapping intervals.
+#    non-overlapping intervals. A boundary index, built once per instance,
+#    answers `contains(x)`, `count_in(a, b)` (number of intervals meeting
+#    [a, b)) in O(log n) and `overlaps(a, b)` (those intervals) in
+#    O(log n + k); `contains_many(xs)` tests a whole batch of points.
+#    With prefix sums of the interval lengths, `measure(a, b)` and
+#    `coverage(a, b)` are O(log n) as well.
 #
 # 6. **Performance and Extensibility:**
 #    All operations are implemented efficiently by reusing the `BoolStepfun`
@@ -61,6 +68,7 @@
 # - Construct a set of intervals:
 #     A = Intervals([(-5, 0), (10, 20)])
 #     B = Intervals([('-oo', -1), (15, None)])
+#     C = Intervals.from_arrays(lefts, rights)     # NumPy arrays, vectorized
 #
 # - Set operations:
 #     U = A | B                    # union
@@ -69,6 +77,7 @@
 #     S = A ^ B                    # symmetric difference
 #     C = -A                       # complement
 #     BIG = Intervals.union(A, B, C, D, S)   # N-ary union
+#     TWO = Intervals.at_least(2, A, B, C)   # covered by at least 2 of 3
 #
 # - Comparison:
 #     if A <= B: ...
@@ -76,14 +85,29 @@
 # - Membership and interval list:
 #     if A(12.5): ...
 #     for left, right in A.intervals: ...
+#     A.count_in(0, 15), A.overlaps(0, 15)     # intervals meeting [0, 15)
+#
+# - Statistics:
+#     A.measure(0, 100), A.coverage(0, 100)    # covered length / share of [0, 100)
+#     A.n_components(), A.gaps(), A.largest_gap()
 #
 # This class, together with `BoolStepfun`, is suitable for interval arithmetic,
 # set-theoretic algorithms, event or coverage modeling, and all situations
 # where rigorous and efficient handling of real intervals is required.
 # =============================================================================
 
+import bisect
+import heapq
+import itertools
+import math
+from array import array
 from typing import Iterable, Tuple, Any, List, Optional
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: only needed by from_arrays
+    np = None
+
 from sandbox.stepfunctions.stepfun import BoolStepfun
 
 
@@ -101,6 +125,8 @@ class Intervals:
         Intervals are left-closed, right-open unless left-unbounded (in which case left-open).
         """
         self._stepfun = self._intervals_to_stepfun(interval_list)
+        self._index = None
+        self._intervals = None
 
     @staticmethod
     def _intervals_to_stepfun(interval_list: Iterable[Tuple[Any, Any]]) -> BoolStepfun:
@@ -138,30 +164,67 @@ class Intervals:
             tv = [(None, False)] + tv
         return BoolStepfun(tv)
 
+    @classmethod
+    def from_arrays(cls, lefts, rights, assume_sorted: bool = False) -> "Intervals":
+        """
+        Vectorized constructor from two arrays of endpoints (requires NumPy); interval k
+        is [lefts[k], rights[k]). nan or +-inf mark unbounded ends. Same result as
+        Intervals(zip(lefts, rights)), but the union is computed by NumPy: a sort by
+        left end (skipped if assume_sorted) and a running maximum of the right ends.
+        The canonical step function is handed over without a second normalization.
+        """
+        if np is None:
+            raise ImportError("Intervals.from_arrays requires NumPy.")
+        lefts = np.asarray(lefts, dtype=np.float64)
+        rights = np.asarray(rights, dtype=np.float64)
+        if lefts.ndim != 1 or lefts.shape != rights.shape:
+            raise ValueError("lefts and rights must be 1-d arrays of equal length.")
+        lefts = np.where(np.isnan(lefts), -np.inf, lefts)
+        rights = np.where(np.isnan(rights), np.inf, rights)
+        if not assume_sorted:
+            # As in the constructor, reversed endpoints are swapped
+            lefts, rights = np.minimum(lefts, rights), np.maximum(lefts, rights)
+        elif np.any(lefts[1:] < lefts[:-1]) or np.any(lefts > rights):
+            raise ValueError("assume_sorted requires ascending lefts and lefts <= rights.")
+        keep = lefts != rights  # degenerate intervals are empty
+        lefts, rights = lefts[keep], rights[keep]
+        if not len(lefts):
+            return cls.from_stepfun(BoolStepfun([(None, False)]))
+        if not assume_sorted:
+            order = np.argsort(lefts, kind='stable')
+            lefts, rights = lefts[order], rights[order]
+        # An interval starts a new component iff it begins after everything before it ends
+        reach = np.maximum.accumulate(rights)
+        starts = np.flatnonzero(np.concatenate(([True], lefts[1:] > reach[:-1])))
+        ends = np.concatenate((starts[1:] - 1, [len(lefts) - 1]))
+        times = np.empty(2 * len(starts))
+        times[0::2], times[1::2] = lefts[starts], reach[ends]
+        values = [True, False] * len(starts)
+        tv = list(zip(times.tolist(), values))
+        if tv[0][0] == float('-inf'):
+            tv[0] = (None, True)
+        else:
+            tv.insert(0, (None, False))
+        return cls.from_stepfun(BoolStepfun._from_canonical(tuple(tv)))
+
     @staticmethod
     def _stepfun_to_intervals(stepfun: BoolStepfun) -> Tuple[Tuple[Any, Any], ...]:
         """
         Converts a BoolStepfun to a canonical sorted tuple of intervals.
         Each interval is (left, right), using None for unbounded ends.
+        A single pass: an interval opens at a True breakpoint and closes at the next False one.
         """
-        tv = list(stepfun.tv_list)
         intervals = []
-        current = None
-        for i, (t, v) in enumerate(tv):
-            if v:  # interval starts here
-                left = t
-                # find where it ends
-                for j in range(i + 1, len(tv)):
-                    t2, v2 = tv[j]
-                    if not v2:
-                        right = t2
-                        break
-                else:
-                    right = None  # unbounded right
-                # Use None for -inf, oo for infinity
-                l = None if left is None else left
-                r = None if right is None else right
-                intervals.append((l, r))
+        left = None
+        is_open = False
+        for t, v in stepfun.tv_list:
+            if v and not is_open:
+                left, is_open = t, True
+            elif not v and is_open:
+                intervals.append((left, t))
+                is_open = False
+        if is_open:
+            intervals.append((left, None))  # unbounded right
         return tuple(intervals)
 
     # Set operations
@@ -181,19 +244,40 @@ class Intervals:
         return Intervals.from_stepfun(~self._stepfun)
 
     # Bulk set operations
+    @staticmethod
+    def at_least(k: int, *intervals: "Intervals") -> "Intervals":
+        """
+        The points covered by at least k of the given interval sets. One counting
+        sweep over all boundary events (heapq.merge of the sorted +1/-1 event
+        streams), O(N log n) for N boundaries in n sets.
+        """
+        count = sum(1 for iv in intervals if iv._stepfun.tv_list[0][1])
+        tv = [(None, count >= k)]
+        # A canonical BoolStepfun alternates: True opens an interval (+1), False closes it (-1)
+        events = heapq.merge(*(itertools.islice(iv._stepfun.tv_list, 1, None) for iv in intervals))
+        last = None
+        for t, v in events:
+            if t != last:
+                # All events at last are counted: emit its value if it changed
+                if last is not None and (count >= k) != tv[-1][1]:
+                    tv.append((last, count >= k))
+                last = t
+            count += 1 if v else -1
+        if last is not None and (count >= k) != tv[-1][1]:
+            tv.append((last, count >= k))
+        return Intervals.from_stepfun(BoolStepfun._from_canonical(tuple(tv)))
+
     @staticmethod
     def union(*intervals: "Intervals") -> "Intervals":
         if not intervals:
             return Intervals([])
-        stepfuns = [iv._stepfun for iv in intervals]
-        return Intervals.from_stepfun(BoolStepfun.logical_or(*stepfuns))
+        return Intervals.at_least(1, *intervals)
 
     @staticmethod
     def intersection(*intervals: "Intervals") -> "Intervals":
         if not intervals:
             return Intervals([])
-        stepfuns = [iv._stepfun for iv in intervals]
-        return Intervals.from_stepfun(BoolStepfun.logical_and(*stepfuns))
+        return Intervals.at_least(len(intervals), *intervals)
 
     # Comparison (subset/superset)
     def __le__(self, other: "Intervals") -> bool:
@@ -219,26 +303,137 @@ class Intervals:
         return other < self
 
     def __str__(self):
-        intervals = self._stepfun_to_intervals(self._stepfun)
-        return f"Intervals{intervals}"
+        return f"Intervals{self.intervals}"
 
     def __repr__(self):
         return str(self)
 
     @property
     def intervals(self) -> Tuple[Tuple[Any, Any], ...]:
-        return self._stepfun_to_intervals(self._stepfun)
+        # Intervals are immutable: converted once, on first access
+        if self._intervals is None:
+            self._intervals = self._stepfun_to_intervals(self._stepfun)
+        return self._intervals
 
     @classmethod
     def from_stepfun(cls, sf: BoolStepfun) -> "Intervals":
         obj = cls([])
         obj._stepfun = sf
+        obj._index = None
+        obj._intervals = None
         return obj
 
     # Expose underlying BoolStepfun for evaluation
     def __call__(self, x) -> bool:
         return self._stepfun(x)
 
+    # Indexed queries
+    def _boundaries(self) -> Tuple[int, Any, Any, Any]:
+        """
+        Returns (s, lefts, rights, prefix), built once: lefts[k] and rights[k] (float
+        arrays, -inf/inf for unbounded ends) bound the k-th maximal interval, whose left
+        end is tv_list[s + 2k]; prefix[k] is the total length of the intervals before k
+        (unbounded ones count 0, they are never summed in between). The canonical step
+        function alternates between True and False, so the boundaries are strided
+        slices of its breakpoint array.
+        """
+        if self._index is None:
+            tv = self._stepfun.tv_list
+            times = self._stepfun._times
+            s = 0 if tv[0][1] else 1
+            lefts, rights = times[s::2], times[s + 1::2]
+            if len(rights) < len(lefts):
+                rights.append(float('inf'))
+            prefix = array('d', [0.0])
+            total = 0.0
+            for l, r in zip(lefts, rights):
+                if math.isfinite(l) and math.isfinite(r):
+                    total += r - l
+                prefix.append(total)
+            self._index = (s, lefts, rights, prefix)
+        return self._index
+
+    def contains(self, x) -> bool:
+        """True iff x lies in one of the intervals; a binary search, O(log n)."""
+        return self._stepfun(x)
+
+    def contains_many(self, xs):
+        """
+        Membership of a batch of points (ndarray of bool with NumPy, a list otherwise).
+        The bool array of the boundary set is built on the first call and reused.
+        """
+        return self._stepfun.evaluate_many(xs)
+
+    def _overlap_range(self, a, b) -> Tuple[int, int]:
+        # Indices [i, j) of the maximal intervals meeting [a, b)
+        _, lefts, rights, _ = self._boundaries()
+        lo = float('-inf') if a in (None, '-oo') else a
+        hi = float('inf') if b in (None, 'oo') else b
+        if lo >= hi:
+            return 0, 0
+        i = bisect.bisect_right(rights, lo)
+        return i, max(bisect.bisect_left(lefts, hi), i)
+
+    def count_in(self, a, b) -> int:
+        """Number of maximal intervals meeting [a, b) (None for unbounded ends), O(log n)."""
+        i, j = self._overlap_range(a, b)
+        return j - i
+
+    def overlaps(self, a, b) -> Tuple[Tuple[Any, Any], ...]:
+        """The maximal intervals meeting [a, b), unclipped, in O(log n + k)."""
+        i, j = self._overlap_range(a, b)
+        s = self._boundaries()[0]
+        tv = self._stepfun.tv_list
+        result = []
+        for p in range(s + 2 * i, s + 2 * j, 2):
+            result.append((tv[p][0], tv[p + 1][0] if p + 1 < len(tv) else None))
+        return tuple(result)
+
+    # Statistics
+    def measure(self, a=None, b=None) -> float:
+        """
+        Total length covered inside [a, b) (None for unbounded ends; inf if an unbounded
+        interval is cut). Two binary searches and a prefix-sum difference, O(log n).
+        """
+        lo = float('-inf') if a in (None, '-oo') else a
+        hi = float('inf') if b in (None, 'oo') else b
+        if lo > hi:
+            raise ValueError("a must be <= b.")
+        i, j = self._overlap_range(a, b)
+        if i == j:
+            return 0.0
+        _, lefts, rights, prefix = self._boundaries()
+        first = min(rights[i], hi) - max(lefts[i], lo)
+        if j - i == 1:
+            return first
+        last = min(rights[j - 1], hi) - max(lefts[j - 1], lo)
+        return first + (prefix[j - 1] - prefix[i + 1]) + last
+
+    def coverage(self, a, b) -> float:
+        """Share of the bounded window [a, b) that is covered, between 0 and 1."""
+        if a in (None, '-oo') or b in (None, 'oo') or not a < b:
+            raise ValueError("coverage requires a bounded window a < b.")
+        return self.measure(a, b) / (b - a)
+
+    def n_components(self) -> int:
+        """Number of maximal (disjoint, non-touching) intervals."""
+        return len(self._boundaries()[1])
+
+    def gaps(self) -> Tuple[Tuple[Any, Any], ...]:
+        """The bounded gaps between consecutive maximal intervals, in order."""
+        s = self._boundaries()[0]
+        tv = self._stepfun.tv_list
+        return tuple((tv[s + 2 * k + 1][0], tv[s + 2 * k + 2][0]) for k in range(self.n_components() - 1))
+
+    def largest_gap(self) -> Optional[Tuple[Any, Any]]:
+        """The longest bounded gap (the first one if several are equally long), None if there is none."""
+        s, lefts, rights, _ = self._boundaries()
+        if len(lefts) < 2:
+            return None
+        k = max(range(len(lefts) - 1), key=lambda k: lefts[k + 1] - rights[k])
+        tv = self._stepfun.tv_list
+        return tv[s + 2 * k + 1][0], tv[s + 2 * k + 2][0]
+
     # Optional: direct access for test/utility
     @property
     def stepfun(self):
@@ -0,0 +1,202 @@
+# project owner: Johannes Siedersleben
+#
+# =============================================================================
+# LazyStepfun: Streaming Combinators over Step Functions
+#
+# Chained arithmetic on `NumericStepfun` (or logic on `BoolStepfun`) builds a
+# full intermediate tuple list at every operator. `LazyStepfun` instead
+# records a pipeline of generators: every operator merges the canonical
+# (timestamp, value) streams of its operands and yields a canonical stream
+# itself, without materializing anything. Data is pulled through the
+# pipeline only by
+#
+#   - `materialize()`, which returns a NumericStepfun / BoolStepfun,
+#   - evaluation `g(x)`, which reads the stream up to x and stops,
+#   - iteration over the lazy step function, which yields its tv-pairs.
+#
+# Memory is O(number of operands) regardless of the number of breakpoints.
+# A lazy step function can be iterated any number of times; each iteration
+# re-runs the pipeline from its sources.
+#
+# Values follow the same semantics as the eager classes: non-numeric (resp.
+# non-bool) values propagate Excel-style, and x / 0 is "DIV/0". The left
+# operand of an operator must be lazy; the right one may be lazy or eager.
+#
+# Usage Overview:
+# ---------------
+#     e = LazyStepfun(f) + LazyStepfun(g) * h        # nothing computed yet
+#     e(3.5)                                         # reads the stream up to 3.5
+#     s = e.materialize()                            # NumericStepfun
+#     b = LazyStepfun.logical_and(b1, b2, b3).materialize()
+# =============================================================================
+
+import functools
+import heapq
+import operator
+from typing import Any, Callable, Iterator, Sequence, Union
+
+from sandbox.stepfunctions.stepfun import AbstractStepfun, NumericStepfun, BoolStepfun, TvPair, Timestamp
+
+
+def _is_number(x) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _div(x, y):
+    if y == 0:
+        return "DIV/0"
+    return x / y
+
+
+def _merge(sources: Sequence['LazyStepfun'], op: Callable, is_valid: Callable) -> Iterator[TvPair]:
+    """
+    Merges the canonical streams of sources (heap-based k-way merge) and yields the
+    canonical stream of op applied left to right to the current values. The first
+    value that fails is_valid propagates instead (Excel logic).
+    """
+    def value(vs):
+        for v in vs:
+            if not is_valid(v):
+                return v
+        return functools.reduce(op, vs)
+
+    iters = [iter(s) for s in sources]
+    current = []
+    heap = []
+    for i, it in enumerate(iters):
+        current.append(next(it)[1])  # the first pair has timestamp None
+        pair = next(it, None)
+        if pair is not None:
+            heap.append((pair[0], i, pair[1]))
+    heapq.heapify(heap)
+    last = value(current)
+    yield None, last
+    while heap:
+        t = heap[0][0]
+        while heap and heap[0][0] == t:
+            _, i, current[i] = heap[0]
+            pair = next(iters[i], None)
+            if pair is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (pair[0], i, pair[1]))
+        v = value(current)
+        if v != last:
+            yield t, v
+            last = v
+
+
+def _map(source: 'LazyStepfun', fn: Callable) -> Iterator[TvPair]:
+    # Canonical stream of fn applied to every value
+    last = object()
+    for t, v in source:
+        v = fn(v)
+        if t is None or v != last:
+            yield t, v
+            last = v
+
+
+class LazyStepfun:
+    """
+    Lazy step function: a recipe that yields canonical (timestamp, value) pairs on
+    demand. Built from a NumericStepfun / BoolStepfun and combined with the usual
+    operators; see the module comment.
+    """
+    __slots__ = ('_source', '_cls')
+
+    def __init__(self, f: Union[AbstractStepfun, 'LazyStepfun']):
+        if isinstance(f, LazyStepfun):
+            self._source, self._cls = f._source, f._cls
+        elif isinstance(f, (NumericStepfun, BoolStepfun)):
+            tv = f.tv_list
+            self._source, self._cls = (lambda: iter(tv)), type(f)
+        else:
+            raise TypeError("LazyStepfun requires a NumericStepfun or BoolStepfun.")
+
+    @classmethod
+    def _from_source(cls, source: Callable[[], Iterator[TvPair]], stepfun_cls: type) -> 'LazyStepfun':
+        obj = cls.__new__(cls)
+        obj._source, obj._cls = source, stepfun_cls
+        return obj
+
+    def __iter__(self) -> Iterator[TvPair]:
+        return self._source()
+
+    def __call__(self, x: Timestamp) -> Any:
+        # Read the stream up to x only
+        value = None
+        for t, v in self:
+            if t is not None and t > x:
+                break
+            value = v
+        return value
+
+    def materialize(self) -> AbstractStepfun:
+        """Pulls the whole stream through the pipeline; returns a NumericStepfun or BoolStepfun."""
+        return self._cls._from_canonical(tuple(self))
+
+    def __repr__(self) -> str:
+        return f"LazyStepfun({self._cls.__name__})"
+
+    # --- Combination ---
+
+    @staticmethod
+    def _combine(fs: Sequence[Union[AbstractStepfun, 'LazyStepfun']], op: Callable, cls: type) -> 'LazyStepfun':
+        if not fs:
+            raise ValueError("At least one step function required.")
+        operands = [LazyStepfun(f) for f in fs]
+        if any(g._cls is not cls for g in operands):
+            raise TypeError(f"Operation requires {cls.__name__} operands.")
+        is_valid = _is_number if cls is NumericStepfun else (lambda v: isinstance(v, bool))
+        return LazyStepfun._from_source(lambda: _merge(operands, op, is_valid), cls)
+
+    def _apply(self, fn: Callable, cls: type) -> 'LazyStepfun':
+        if self._cls is not cls:
+            raise TypeError(f"Operation requires a {cls.__name__} operand.")
+        return LazyStepfun._from_source(lambda: _map(self, fn), cls)
+
+    @staticmethod
+    def sum(*fs) -> 'LazyStepfun':
+        return LazyStepfun._combine(fs, operator.add, NumericStepfun)
+
+    @staticmethod
+    def multiply(*fs) -> 'LazyStepfun':
+        return LazyStepfun._combine(fs, operator.mul, NumericStepfun)
+
+    @staticmethod
+    def logical_and(*fs) -> 'LazyStepfun':
+        return LazyStepfun._combine(fs, operator.and_, BoolStepfun)
+
+    @staticmethod
+    def logical_or(*fs) -> 'LazyStepfun':
+        return LazyStepfun._combine(fs, operator.or_, BoolStepfun)
+
+    def __add__(self, other) -> 'LazyStepfun':
+        return LazyStepfun._combine([self, other], operator.add, NumericStepfun)
+
+    def __sub__(self, other) -> 'LazyStepfun':
+        return LazyStepfun._combine([self, other], operator.sub, NumericStepfun)
+
+    def __mul__(self, other) -> 'LazyStepfun':
+        return LazyStepfun._combine([self, other], operator.mul, NumericStepfun)
+
+    def __truediv__(self, other) -> 'LazyStepfun':
+        return LazyStepfun._combine([self, other], _div, NumericStepfun)
+
+    def __neg__(self) -> 'LazyStepfun':
+        return self._apply(lambda v: -v if _is_number(v) else v, NumericStepfun)
+
+    def __abs__(self) -> 'LazyStepfun':
+        return self._apply(lambda v: abs(v) if _is_number(v) else v, NumericStepfun)
+
+    def __and__(self, other) -> 'LazyStepfun':
+        return LazyStepfun._combine([self, other], operator.and_, BoolStepfun)
+
+    def __or__(self, other) -> 'LazyStepfun':
+        return LazyStepfun._combine([self, other], operator.or_, BoolStepfun)
+
+    def __xor__(self, other) -> 'LazyStepfun':
+        return LazyStepfun._combine([self, other], operator.xor, BoolStepfun)
+
+    def __invert__(self) -> 'LazyStepfun':
+        return self._apply(lambda v: not v if isinstance(v, bool) else v, BoolStepfun)
@@ -24,7 +24,12 @@
 #    Step function objects are immutable. Upon construction, the breakpoint
 #    list is normalized: timestamps are sorted, duplicate timestamps are
 #    resolved (last value wins), and consecutive identical values are merged.
-#    This ensures each step function is in canonical form.
+#    This ensures each step function is in canonical form. Input known to be
+#    sorted can skip the sort (`assume_sorted=True`, one O(n) pass); results
+#    of internal operations, which are canonical by construction, bypass
+#    normalization altogether (`_from_canonical`). Being immutable, step
+#    functions are hashable (the hash is cached), can be interned
+#    (`f.intern()`), and operations on them can be memoized (`memoize_op`).
 #
 # 3. **Evaluation and Arithmetic:**
 #    Step functions support fast evaluation at arbitrary points via
@@ -43,9 +48,11 @@
 # 5. **Efficient N-ary Operations:**
 #    Unlike naïve implementations, the library provides efficient static
 #    methods (e.g., `sum`, `multiply` for numeric, `logical_and`,
-#    `logical_or` for boolean) that combine N step functions in O(n)
-#    time by merging their breakpoints in a single pass. This is much faster
-#    than chaining binary operations.
+#    `logical_or` for boolean) that combine k step functions with N
+#    breakpoints in total in a single heap-based sweep (`_sweep`), touching
+#    only the operands that step at each breakpoint. This is much faster
+#    than chaining binary operations. `minimum`/`maximum` keep a running
+#    heap; `map` and `clip` transform values once per interval.
 #
 # 6. **Extensibility via Abstract Base:**
 #    All normalization, merging, and evaluation logic is contained in the
@@ -58,7 +65,16 @@
 # 7. **Scan/Discretization Utility:**
 #    The `scan` class method enables users to create a step function from any
 #    callable over a specified range and step size, making it easy to
-#    discretize arbitrary mathematical functions.
+#    discretize arbitrary mathematical functions. NumPy-vectorized callables
+#    can be evaluated on the whole grid at once (`vectorized=True`). Expensive
+#    callables with few changes can be sampled on a coarse grid and bisected
+#    only where the value changes (`adaptive=True`), or scanned in chunks by
+#    a process pool (`workers=n`).
+#
+# 8. **Binary Storage:**
+#    `save(path)` / `load(path)` write and read a compact binary format (a
+#    header plus a float64 breakpoint array and a typed value array, see
+#    `storage.py`); `ArrayStepfun.load` memory-maps such files.
 #
 # Usage Overview:
 # ---------------
@@ -78,6 +94,10 @@
 #     m = NumericStepfun.sum(f, h, ...)
 #     b_all = BoolStepfun.logical_and(g, ...)
 #
+# - Zoom into a window (f on [a, b), None elsewhere), O(log n + k):
+#     w = f[0:10]
+#     w = f.restrict(0, 10, fill=0)
+#
 # - Discretize a function:
 #     sf = AbstractStepfun.scan(lambda x: int(x >= 0), -10, 10, 1)
 #
@@ -87,16 +107,38 @@
 # =============================================================================
 
 import bisect
+import heapq
+import math
+import weakref
+from concurrent.futures import ProcessPoolExecutor
 from abc import ABC, abstractmethod
+from array import array
 from typing import (
-    Iterable, Tuple, Any, Union, Callable, TypeVar
+    Iterable, Tuple, Any, Union, Callable, TypeVar, Sequence
 )
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: batch operations fall back to pure Python
+    np = None
+
 Timestamp = Union[int, float, None, str]
+_FLOAT_EXACT = 2 ** 53  # ints up to this magnitude are exact in float64
 TvPair = Tuple[Timestamp, Any]
 T = TypeVar('T', bound='AbstractStepfun')
 
 
+def _scan_chunk(f: Callable, left_bound: float, step: float, lo: int, hi: int) -> list:
+    # Worker of the parallel scan: (k, f(x_k)) for grid points lo <= k < hi where the value changes,
+    # starting with lo itself
+    result = []
+    for k in range(lo, hi):
+        v = f(left_bound + k * step)
+        if not result or v != result[-1][1]:
+            result.append((k, v))
+    return result
+
+
 class AbstractStepfun(ABC):
     """
     Abstract base class for step functions (any value type, any domain).
@@ -106,14 +148,40 @@ class AbstractStepfun(ABC):
       - merging timestamps
       - scanning/discretizing a function into a step function
     Value-type-specific logic is delegated to subclasses.
+    The breakpoints are cached as a compact float array (`_times`, None mapped
+    to -inf) next to `_tv_list`, so evaluation is a plain binary search. If an
+    int timestamp is beyond the exact range of float64 (e.g. nanosecond epochs),
+    `_times` is an exact list instead.
+    Prefix sums of the integral (`_prefix`) are built on first use by integrate,
+    the values as an ndarray (`_values`) on first use by evaluate_many, and the
+    integration weights as an ndarray (`_weights`) on first use by integrate_many.
+    Step functions are hashable; the structural hash (`_hash`) is computed once,
+    on first use.
     """
-    __slots__ = ('_tv_list',)
+    __slots__ = ('_tv_list', '_times', '_prefix', '_values', '_weights', '_hash', '__weakref__')
 
     _tv_list: Tuple[TvPair, ...]
+    _times: Union[array, list]
+    _prefix: Union[array, None, bool]
+    _values: Any
+    _weights: Any
+    _hash: Union[int, None]
 
-    def __init__(self, tv_list: Iterable[TvPair] | 'AbstractStepfun'):
+    # Interned step functions, see intern(); entries vanish with their last reference
+    _interned = weakref.WeakValueDictionary()
+
+    def __init__(self, tv_list: Iterable[TvPair] | 'AbstractStepfun', assume_sorted: bool = False):
+        """
+        tv_list: iterable of (timestamp, value) pairs in any order, or a step function.
+        assume_sorted: the pairs are known to be in ascending timestamp order; the sort
+        is skipped and the list is validated and normalized in a single O(n) pass.
+        """
         if isinstance(tv_list, AbstractStepfun):
-            self._tv_list = tv_list._tv_list
+            self._set_tv_list(tv_list._tv_list, tv_list._times)
+            self._hash = tv_list._hash
+            return
+        if assume_sorted:
+            self._set_tv_list(self._normalize_sorted(tv_list))
             return
 
         items = []
@@ -145,7 +213,70 @@ class AbstractStepfun(ABC):
         for t, v in norm:
             if not merged or merged[-1][1] != v:
                 merged.append((t, v))
-        self._tv_list = tuple(merged)
+        self._set_tv_list(tuple(merged))
+
+    @staticmethod
+    def _normalize_sorted(tv_list: Iterable[TvPair]) -> Tuple[TvPair, ...]:
+        # One pass over pairs in ascending order: validate, dedupe (last wins), merge equal values
+        builder = StepfunBuilder()
+        builder.extend(tv_list)
+        return builder.tv_list
+
+    @classmethod
+    def from_events(cls, events: Iterable[TvPair]) -> 'AbstractStepfun':
+        """
+        Streaming constructor: consumes an iterator of (timestamp, value) events in
+        ascending timestamp order without buffering it (see StepfunBuilder).
+        Called on AbstractStepfun, the subclass is inferred as in make_stepfun.
+        """
+        builder = StepfunBuilder(None if cls is AbstractStepfun else cls)
+        builder.extend(events)
+        return builder.build()
+
+    def save(self, path) -> None:
+        """Writes the step function to path in the binary format of storage.py (requires NumPy)."""
+        from sandbox.stepfunctions import storage
+        storage.save(self, path)
+
+    @classmethod
+    def load(cls, path) -> 'AbstractStepfun':
+        """
+        Reads a step function written by save (requires NumPy). Returns a BoolStepfun
+        or NumericStepfun as stored; called on a subclass, the stored class must match.
+        """
+        from sandbox.stepfunctions import storage
+        f = storage.load_stepfun(path)
+        if not isinstance(f, cls):
+            raise TypeError(f"{path} holds a {type(f).__name__}, not a {cls.__name__}.")
+        return f
+
+    @classmethod
+    def _from_canonical(cls: type[T], tv_list: Tuple[TvPair, ...]) -> T:
+        """
+        Trusted internal constructor: tv_list must already be a canonical tuple
+        (sorted, None first, no duplicate timestamps, no equal neighbours).
+        No checks, no normalization.
+        """
+        obj = cls.__new__(cls)
+        obj._set_tv_list(tv_list)
+        return obj
+
+    def _set_tv_list(self, tv_list: Tuple[TvPair, ...], times: Union[array, list] = None) -> None:
+        self._tv_list = tv_list
+        self._times = self._make_times(tv_list) if times is None else times
+        self._prefix = None
+        self._values = None
+        self._weights = None
+        self._hash = None
+
+    @staticmethod
+    def _make_times(tv: Tuple[TvPair, ...]) -> Union[array, list]:
+        # Sorted breakpoints as float64, None (first timestamp) mapped to -inf.
+        # Ints beyond 2**53 would collapse in float64: then the exact values are kept in a list
+        times = [float('-inf') if t is None else t for t, _ in tv]
+        if any(isinstance(t, int) and abs(t) > _FLOAT_EXACT for t in times):
+            return times
+        return array('d', times)
 
     @property
     def tv_list(self) -> Tuple[TvPair, ...]:
@@ -161,12 +292,144 @@ class AbstractStepfun(ABC):
 
     def __call__(self, x: Timestamp) -> Any:
         # Evaluate at any real x, using first value for x less than all breakpoints
-        tv = self._tv_list
-        times = [float('-inf') if t is None else t for t, _ in tv]
-        idx = bisect.bisect_right(times, x) - 1
+        idx = bisect.bisect_right(self._times, x) - 1
         if idx < 0:
             idx = 0
-        return tv[idx][1]
+        return self._tv_list[idx][1]
+
+    def evaluate_many(self, xs: Iterable[Timestamp]) -> Any:
+        """
+        Evaluates the step function at a whole batch of points in one call.
+        With NumPy, xs (array or any sequence) is located by a single
+        numpy.searchsorted over the breakpoint array and an ndarray is returned
+        (a scalar x counts as one point).
+        Without NumPy a list is returned: sorted xs are evaluated by one merge
+        pass over the breakpoints, unsorted xs by binary search per point.
+        """
+        tv = self._tv_list
+        times = self._times
+        if np is not None and isinstance(times, array):
+            xs = np.atleast_1d(np.asarray(xs, dtype=float))
+            idx = np.searchsorted(np.frombuffer(times), xs, side='right') - 1
+            np.maximum(idx, 0, out=idx)
+            return self._value_array()[idx]
+        if np is not None:
+            # Exact breakpoints: binary search per point, as float64 would merge them
+            idx = [max(bisect.bisect_right(times, x) - 1, 0) for x in np.atleast_1d(np.asarray(xs)).tolist()]
+            return self._value_array()[np.array(idx, dtype=np.intp)]
+        xs = list(xs)
+        if all(x0 <= x1 for x0, x1 in zip(xs, xs[1:])):
+            result = []
+            i, n = 0, len(times)
+            for x in xs:
+                while i + 1 < n and times[i + 1] <= x:
+                    i += 1
+                result.append(tv[i][1])
+            return result
+        return [tv[max(bisect.bisect_right(times, x) - 1, 0)][1] for x in xs]
+
+    def _value_array(self) -> 'np.ndarray':
+        # Values as an ndarray, built once: bool or numeric dtype if homogeneous, object otherwise
+        if self._values is None:
+            values = [v for _, v in self._tv_list]
+            if all(isinstance(v, bool) for v in values):
+                self._values = np.array(values, dtype=bool)
+            elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                self._values = np.array(values)
+            else:
+                self._values = np.fromiter(values, dtype=object, count=len(values))
+        return self._values
+
+    def restrict(self: T, a: Timestamp = None, b: Timestamp = None, fill: Any = None) -> T:
+        """
+        Returns the step function equal to self on [a, b) and fill elsewhere
+        (None for a or b: no bound on that side). Two binary searches on the
+        breakpoint array locate the window, so the cost is O(log n + k) for k
+        breakpoints inside the window, independent of the length of self.
+        """
+        tv, times = self._tv_list, self._times
+        if a is not None and b is not None and a >= b:
+            return self._from_canonical(((None, fill),))
+        result = []
+
+        def push(t, v):
+            if not result or result[-1][1] != v:
+                result.append((t, v))
+
+        if a is None:
+            push(None, tv[0][1])
+            lo = 1
+        else:
+            lo = bisect.bisect_right(times, a)  # first breakpoint > a
+            push(None, fill)
+            push(a, tv[max(lo - 1, 0)][1])
+        hi = len(tv) if b is None else bisect.bisect_left(times, b)  # first breakpoint >= b
+        for t, v in tv[lo:hi]:
+            push(t, v)
+        if b is not None:
+            push(b, fill)
+        return self._from_canonical(tuple(result))
+
+    def __getitem__(self: T, window: slice) -> T:
+        """f[a:b] is f.restrict(a, b): f on [a, b), None elsewhere."""
+        if not isinstance(window, slice) or window.step is not None:
+            raise TypeError("Step functions support window slicing f[a:b] only.")
+        return self.restrict(window.start, window.stop)
+
+    def _walk(self, other: 'AbstractStepfun'):
+        """
+        Two-pointer walk over the canonical tv-lists of self and other: yields the pair
+        of values (self, other) on every interval of the merged breakpoints, in order.
+        O(n + m), nothing is evaluated by binary search.
+        """
+        a, b = self._tv_list, other._tv_list
+        ta, tb = self._times, other._times
+        na, nb = len(a), len(b)
+        i = j = 1
+        yield a[0][1], b[0][1]
+        while i < na or j < nb:
+            if j == nb or (i < na and ta[i] < tb[j]):
+                i += 1
+            elif i == na or tb[j] < ta[i]:
+                j += 1
+            else:
+                i += 1
+                j += 1
+            yield a[i - 1][1], b[j - 1][1]
+
+    def _holds(self, other: 'AbstractStepfun', op: Callable, is_valid: Callable) -> bool:
+        # True iff op(v1, v2) holds for valid values on every interval; stops at the first failure
+        return all(is_valid(v1) and is_valid(v2) and op(v1, v2) for v1, v2 in self._walk(other))
+
+    @staticmethod
+    def _sweep(fs: Sequence['AbstractStepfun']):
+        """
+        Sweep line over the union of the breakpoints of fs (heap-based k-way merge).
+        Yields (t, current, changed) for each distinct breakpoint t in ascending
+        order, starting with t = None: current holds the value of every operand on
+        [t, next t) and is updated in place; changed lists (i, old value) for the
+        operands stepping at t (all operands, with old value None, at t = None).
+        Total cost is O(N log k) for N breakpoints over k operands.
+        """
+        tv_lists = [f._tv_list for f in fs]
+        current = [tv[0][1] for tv in tv_lists]
+        yield None, current, [(i, None) for i in range(len(fs))]
+        heap = [(f._times[1], i, 1) for i, f in enumerate(fs) if len(f._tv_list) > 1]
+        heapq.heapify(heap)
+        while heap:
+            x, i, j = heap[0]
+            t = tv_lists[i][j][0]
+            changed = []
+            while heap and heap[0][0] == x:
+                _, i, j = heap[0]
+                tv = tv_lists[i]
+                changed.append((i, current[i]))
+                current[i] = tv[j][1]
+                if j + 1 < len(tv):
+                    heapq.heapreplace(heap, (fs[i]._times[j + 1], i, j + 1))
+                else:
+                    heapq.heappop(heap)
+            yield t, current, changed
 
     @classmethod
     def merge_timestamps(cls, *tv_lists):
@@ -186,15 +449,35 @@ class AbstractStepfun(ABC):
             f: Callable[[float], Any],
             left_bound: float,
             right_bound: float,
-            step: float
+            step: float,
+            vectorized: bool = False,
+            adaptive: bool = False,
+            coarse: int = 64,
+            workers: int = None
     ) -> 'AbstractStepfun':
         """
         Returns a step function (as an instance of the current subclass)
         where timestamps are left_bound + n*step and value is f(left_bound + n*step).
         Domain covers all x in [left_bound, right_bound).
+        vectorized: f is a NumPy-vectorized callable (ufunc-like). It is called once
+        on the whole grid, and change points are found by numpy.diff (requires NumPy).
+        adaptive: f is sampled every coarse grid points only, and intervals whose end
+        values differ are bisected down to step. This needs O(changes * log(coarse))
+        calls instead of one per grid point, but misses a change that reverts
+        between two coarse samples (e.g. a spike shorter than coarse * step).
+        workers: the grid is split into chunks which are scanned in a process pool
+        of this size; f must be picklable (e.g. a module-level function).
         """
         if step <= 0:
             raise ValueError("Step must be positive.")
+        if vectorized + adaptive + (workers is not None) > 1:
+            raise ValueError("Choose one of vectorized, adaptive or parallel scan.")
+        if vectorized:
+            return AbstractStepfun._scan_vectorized(f, left_bound, right_bound, step)
+        if adaptive:
+            return AbstractStepfun._scan_adaptive(f, left_bound, right_bound, step, coarse)
+        if workers is not None:
+            return AbstractStepfun._scan_parallel(f, left_bound, right_bound, step, workers)
         v_prev = None
         n = 0
         x = left_bound
@@ -206,15 +489,102 @@ class AbstractStepfun(ABC):
             v_prev = v
             x = left_bound + (n + 1) * step
             n += 1
-        return AbstractStepfun.make_stepfun(result)
+        return AbstractStepfun.make_stepfun(result, assume_sorted=True)
+
+    @staticmethod
+    def _scan_vectorized(f: Callable, left_bound: float, right_bound: float, step: float) -> 'AbstractStepfun':
+        if np is None:
+            raise ImportError("Vectorized scan requires NumPy.")
+        n = AbstractStepfun._grid_size(left_bound, right_bound, step)
+        if not n:
+            return AbstractStepfun.make_stepfun([])
+        xs = left_bound + np.arange(n) * step
+        values = np.asarray(f(xs))
+        if values.shape != xs.shape:
+            raise ValueError("Vectorized f must return one value per grid point.")
+        idx = np.flatnonzero(values[1:] != values[:-1]) + 1
+        result = [(None, values[0].item())]
+        result.extend(zip(xs[idx].tolist(), values[idx].tolist()))
+        return AbstractStepfun.make_stepfun(result, assume_sorted=True)
+
+    @staticmethod
+    def _scan_adaptive(f: Callable, left_bound: float, right_bound: float, step: float,
+                       coarse: int) -> 'AbstractStepfun':
+        if coarse < 1:
+            raise ValueError("coarse must be a positive number of grid steps.")
+        n = AbstractStepfun._grid_size(left_bound, right_bound, step)
+        if not n:
+            return AbstractStepfun.make_stepfun([])
+        cache = {}
+
+        def value(k):
+            # f at grid point k, each grid point evaluated at most once
+            if k not in cache:
+                cache[k] = f(left_bound + k * step)
+            return cache[k]
+
+        changes = []
+
+        def refine(i, j):
+            # value(i) != value(j): collect the change points in (i, j], in order
+            if j == i + 1:
+                changes.append(j)
+                return
+            m = (i + j) // 2
+            if value(i) != value(m):
+                refine(i, m)
+            if value(m) != value(j):
+                refine(m, j)
+
+        samples = list(range(0, n, coarse))
+        if samples[-1] != n - 1:
+            samples.append(n - 1)
+        for i, j in zip(samples, samples[1:]):
+            if value(i) != value(j):
+                refine(i, j)
+        result = [(None, value(0))]
+        result.extend((left_bound + k * step, value(k)) for k in changes)
+        return AbstractStepfun.make_stepfun(result, assume_sorted=True)
+
+    @staticmethod
+    def _scan_parallel(f: Callable, left_bound: float, right_bound: float, step: float,
+                       workers: int) -> 'AbstractStepfun':
+        if workers < 1:
+            raise ValueError("workers must be a positive number of processes.")
+        n = AbstractStepfun._grid_size(left_bound, right_bound, step)
+        if not n:
+            return AbstractStepfun.make_stepfun([])
+        # A few chunks per worker balance uneven costs of f
+        size = max(-(-n // (4 * workers)), 1)
+        bounds = [(lo, min(lo + size, n)) for lo in range(0, n, size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_scan_chunk, *zip(*[(f, left_bound, step, lo, hi) for lo, hi in bounds]))
+            result = []
+            for part in parts:
+                for k, v in part:
+                    # Stitch: drop a chunk's first value if it continues the previous chunk
+                    if not result or result[-1][1] != v:
+                        result.append((left_bound + k * step if result else None, v))
+        return AbstractStepfun.make_stepfun(result, assume_sorted=True)
+
+    @staticmethod
+    def _grid_size(left_bound: float, right_bound: float, step: float) -> int:
+        # Number of grid points left_bound + n*step < right_bound, as computed by the scan loop
+        n = max(math.ceil((right_bound - left_bound) / step), 0)
+        while n > 0 and left_bound + (n - 1) * step >= right_bound:
+            n -= 1
+        while left_bound + n * step < right_bound:
+            n += 1
+        return n
 
     @staticmethod
-    def make_stepfun(tv_list: Iterable[TvPair]) -> 'AbstractStepfun':
+    def make_stepfun(tv_list: Iterable[TvPair], assume_sorted: bool = False) -> 'AbstractStepfun':
         """
         Factory method: Inspects value types and returns the best subclass.
         - All bools   -> BoolStepfun
         - All numeric -> NumericStepfun
         - Otherwise   -> raise TypeError
+        assume_sorted is passed on to the constructor.
         """
         tv_list = list(tv_list)
 
@@ -226,9 +596,9 @@ class AbstractStepfun(ABC):
 
         values = [v for _, v in tv_list]
         if all(is_bool(v) for v in values):
-            return BoolStepfun(tv_list)
+            return BoolStepfun(tv_list, assume_sorted=assume_sorted)
         elif all(is_number(v) for v in values):
-            return NumericStepfun(tv_list)
+            return NumericStepfun(tv_list, assume_sorted=assume_sorted)
         else:
             raise TypeError("Cannot infer value type for step function: must be all bool or all numeric.")
 
@@ -266,37 +636,133 @@ class AbstractStepfun(ABC):
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, AbstractStepfun):
             return NotImplemented
-        # Merge all timestamps for complete comparison, including None/"-oo"
-        all_timestamps = self.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            tx = float('-inf') if t is None else t
-            if self(tx) != other(tx):
-                return False
-        return True
+        # Canonical form is unique: equal functions have equal tv-lists
+        return self._tv_list == other._tv_list
+
+    def __hash__(self) -> int:
+        # Consistent with __eq__, which compares canonical tv-lists; requires hashable values
+        if self._hash is None:
+            self._hash = hash(self._tv_list)
+        return self._hash
+
+    def intern(self: T) -> T:
+        """
+        Returns the interned step function equal to self (of the same class): the first
+        one interned, as long as it is alive. Interned step functions can be compared
+        and used as cache keys by identity.
+        """
+        key = (type(self), self._tv_list)
+        f = AbstractStepfun._interned.get(key)
+        if f is None:
+            AbstractStepfun._interned[key] = f = self
+        return f
 
     def integrate(self, start: Timestamp, end: Timestamp) -> float:
+        """
+        Integral over [start, end). Non-numeric values count as 0.
+        Uses the prefix-sum index: two binary searches and a subtraction.
+        """
         if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
             raise ValueError("Integration bounds must be numbers.")
         if start > end:
             raise ValueError("Start must be <= end.")
         if start == end:
             return 0.0
+        prefix = self._prefix_sums()
+        if prefix is False:
+            return self._integrate_scan(start, end)
         tv = self._tv_list
-        times = [float('-inf') if t is None else t for t, _ in tv]
-        # Only add change points in (start, end)
-        points = [start]
-        for t in times:
-            if start < t < end:
-                points.append(t)
-        points.append(end)
-        points.sort()
+        times = self._times
+        i = max(bisect.bisect_right(times, start) - 1, 0)
+        j = max(bisect.bisect_right(times, end) - 1, 0)
+        if i == j:
+            return float((end - start) * self._weight(tv[i][1]))
+        return ((times[i + 1] - start) * self._weight(tv[i][1])
+                + (prefix[j] - prefix[i + 1])
+                + (end - times[j]) * self._weight(tv[j][1]))
+
+    def integrate_many(self, starts: Iterable[float], ends: Iterable[float]) -> Any:
+        """
+        Integrals over many windows [starts[k], ends[k]) in one call.
+        With NumPy, all windows are located by numpy.searchsorted and evaluated in
+        one vectorized pass over the prefix-sum index; an ndarray is returned.
+        Without NumPy (or with non-finite inner values, or timestamps beyond the
+        precision of float64) integrate is applied per window and a list is returned.
+        """
+        prefix = self._prefix_sums()
+        if np is None or prefix is False or not isinstance(self._times, array):
+            starts, ends = list(starts), list(ends)
+            if len(starts) != len(ends):
+                raise ValueError("starts and ends must have the same length.")
+            return [self.integrate(a, b) for a, b in zip(starts, ends)]
+        starts = np.asarray(starts, dtype=float)
+        ends = np.asarray(ends, dtype=float)
+        if starts.shape != ends.shape:
+            raise ValueError("starts and ends must have the same length.")
+        if np.any(starts > ends):
+            raise ValueError("Start must be <= end.")
+        times = np.frombuffer(self._times)
+        cum = np.frombuffer(prefix)
+        weights = self._weight_array()
+        last = len(times) - 1
+        i = np.maximum(np.searchsorted(times, starts, side='right') - 1, 0)
+        j = np.maximum(np.searchsorted(times, ends, side='right') - 1, 0)
+        nxt = np.minimum(i + 1, last)
+        with np.errstate(invalid='ignore'):
+            spread = ((times[nxt] - starts) * weights[i]
+                      + (cum[j] - cum[nxt])
+                      + (ends - times[j]) * weights[j])
+            inner = np.where(i == j, (ends - starts) * weights[i], spread)
+        # Empty windows are 0 as in integrate, even in an infinite segment (0 * inf = nan)
+        return np.where(starts == ends, 0.0, inner)
+
+    def _weight_array(self) -> 'np.ndarray':
+        # Weights of the values (see _weight) as a float64 ndarray, built once
+        if self._weights is None:
+            self._weights = np.array([self._weight(v) for _, v in self._tv_list], dtype=float)
+        return self._weights
+
+    @staticmethod
+    def _weight(v: Any) -> Union[int, float]:
+        # Contribution of a value to an integral: non-numeric values count as 0
+        return v if isinstance(v, (int, float)) else 0
+
+    def _prefix_sums(self) -> Union[array, bool]:
+        """
+        Lazily built cumulative-integral index: prefix[i] is the integral from the
+        first finite breakpoint times[1] to times[i] (prefix[0] = prefix[1] = 0).
+        False if an inner value is not finite, since inf/nan would spoil every difference.
+        """
+        if self._prefix is None:
+            tv = self._tv_list
+            times = self._times
+            prefix = array('d', [0.0] * min(len(tv), 2))
+            total = 0.0
+            for i in range(1, len(tv) - 1):
+                w = self._weight(tv[i][1])
+                if not math.isfinite(w):
+                    self._prefix = False
+                    return False
+                total += (times[i + 1] - times[i]) * w
+                prefix.append(total)
+            self._prefix = prefix
+        return self._prefix
+
+    def _integrate_scan(self, start: float, end: float) -> float:
+        # Direct walk over the change points in (start, end), located by binary search
+        tv = self._tv_list
+        times = self._times
+        lo = bisect.bisect_right(times, start)
+        hi = bisect.bisect_left(times, end)
         total = 0.0
-        for i in range(len(points) - 1):
-            x0 = points[i]
-            x1 = points[i + 1]
-            val = self(x0)
+        x0, val = start, tv[lo - 1][1]
+        for i in range(lo, hi):
+            x1 = times[i]
             if isinstance(val, (int, float)):
                 total += (x1 - x0) * val
+            x0, val = x1, tv[i][1]
+        if isinstance(val, (int, float)):
+            total += (end - x0) * val
         return total
 
 
@@ -309,6 +775,100 @@ class AbstractStepfun(ABC):
 from typing import Any, Callable, Sequence
 
 
+class _RunningSum:
+    """
+    Running sum of a multiset of numbers under insertion and removal, used by
+    NumericStepfun._combine to update a sum in O(1) when one operand steps.
+    Ints are summed exactly; finite floats are kept as exact Shewchuk partials
+    (as in math.fsum), so removals leave no rounding residue behind.
+    The value is an int as long as no float is present, like sum() of ints.
+    """
+    __slots__ = ('_int', '_partials', '_n_float', '_nonfinite')
+
+    def __init__(self):
+        self._int = 0
+        self._partials = []
+        self._n_float = 0
+        self._nonfinite = [0, 0, 0]  # counts of inf, -inf, nan
+
+    def add(self, x, sign: int = 1) -> None:
+        if isinstance(x, int):
+            self._int += sign * x
+            return
+        self._n_float += sign
+        if not math.isfinite(x):
+            self._nonfinite[2 if math.isnan(x) else int(x < 0)] += sign
+            return
+        x = sign * x
+        partials = self._partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def remove(self, x) -> None:
+        self.add(x, -1)
+
+    def value(self):
+        if not self._n_float:
+            return self._int
+        n_inf, n_neg_inf, n_nan = self._nonfinite
+        if n_nan or (n_inf and n_neg_inf):
+            return math.nan
+        if n_inf or n_neg_inf:
+            return math.inf if n_inf else -math.inf
+        return math.fsum(self._partials + [self._int])
+
+
+class _RunningExtreme:
+    """
+    Running minimum (sign 1) or maximum (sign -1) of a multiset of numbers under
+    insertion and removal, used by NumericStepfun._combine for minimum/maximum.
+    A heap with lazy deletion: removed values stay in the heap until they reach
+    the top, so add, remove and value are O(log k) amortized. nan dominates
+    (the value is nan while any nan is present), as in numpy.minimum/maximum.
+    """
+    __slots__ = ('_sign', '_heap', '_removed', '_n_nan')
+
+    def __init__(self, sign: int = 1):
+        self._sign = sign
+        self._heap = []
+        self._removed = {}
+        self._n_nan = 0
+
+    def add(self, x) -> None:
+        if x != x:
+            self._n_nan += 1
+            return
+        heapq.heappush(self._heap, self._sign * x)
+
+    def remove(self, x) -> None:
+        if x != x:
+            self._n_nan -= 1
+            return
+        key = self._sign * x
+        self._removed[key] = self._removed.get(key, 0) + 1
+
+    def value(self):
+        if self._n_nan:
+            return math.nan
+        heap, removed = self._heap, self._removed
+        while heap[0] in removed:
+            key = heapq.heappop(heap)
+            if removed[key] == 1:
+                del removed[key]
+            else:
+                removed[key] -= 1
+        return self._sign * heap[0]
+
+
 class NumericStepfun(AbstractStepfun):
     """
     Step function for numeric values, supporting +, -, *, / and all numeric comparisons.
@@ -322,62 +882,120 @@ class NumericStepfun(AbstractStepfun):
             fs: Sequence['NumericStepfun'],
             op: Callable,
             identity: Any = None,
-            left_assoc: bool = False
+            left_assoc: bool = False,
+            running: Callable[[], Any] = None
     ) -> 'NumericStepfun':
         """
         Combine several NumericStepfuns by merging their change points and applying an operator.
         If left_assoc is False (commutative), use identity and reduce over all values.
         If left_assoc is True (non-commutative), apply op in order (left to right), with no identity.
+        If running is given (for associative, invertible ops such as add), it is a factory of a
+        running aggregate with add(x), remove(x) and value(): at each change point only the
+        operands that step are removed and re-added, instead of reducing over all k values.
         Non-numeric values propagate: if any value is non-numeric, it is returned immediately (Excel logic).
         """
         if not fs:
             raise ValueError("At least one step function required.")
-        tv_lists = [f._tv_list for f in fs]
-        # Merge all timestamps, taking care of None (which always sorts first)
-        timestamps = AbstractStepfun.merge_timestamps(*tv_lists)
-        idxs = [0] * len(fs)
-        lengths = [len(tv) for tv in tv_lists]
+        # Sweep over the merged change points; only operands stepping at t are revisited
+        agg = running() if running is not None else None
+        bad = set()  # indices of operands with a non-numeric current value
         result = []
-        for t in timestamps:
-            current = []
-            for i, tv in enumerate(tv_lists):
-                while idxs[i] + 1 < lengths[i] and (
-                        float('-inf') if tv[idxs[i] + 1][0] is None else tv[idxs[i] + 1][0]) <= (
-                        float('-inf') if t is None else t):
-                    idxs[i] += 1
-                current.append(tv[idxs[i]][1])
-            for val in current:
-                if not (isinstance(val, (int, float)) and not isinstance(val, bool)):
-                    v = val
-                    break
-            else:
-                if left_assoc:
-                    v = current[0]
-                    for val in current[1:]:
-                        v = op(v, val)
+        for t, current, changed in AbstractStepfun._sweep(fs):
+            for i, old in changed:
+                if agg is not None and isinstance(old, (int, float)) and not isinstance(old, bool):
+                    agg.remove(old)
+                val = current[i]
+                if isinstance(val, (int, float)) and not isinstance(val, bool):
+                    bad.discard(i)
+                    if agg is not None:
+                        agg.add(val)
                 else:
-                    v = functools.reduce(op, current, identity)
+                    bad.add(i)
+            if bad:
+                v = current[min(bad)]
+            elif agg is not None:
+                v = agg.value()
+            elif left_assoc:
+                v = current[0]
+                for val in current[1:]:
+                    v = op(v, val)
+            else:
+                v = functools.reduce(op, current, identity)
             if not result or result[-1][1] != v:
                 result.append((t, v))
-        return NumericStepfun(result)
+        return NumericStepfun._from_canonical(tuple(result))
 
     @staticmethod
     def sum(*fs: 'NumericStepfun') -> 'NumericStepfun':
-        """Efficiently sum multiple NumericStepfun objects in a single pass."""
-        return NumericStepfun._combine(fs, operator.add, 0, left_assoc=False)
+        """
+        Efficiently sum multiple NumericStepfun objects in a single pass. Each value is the
+        correctly rounded sum of the operands (as math.fsum), so sum(f, g, h) may differ from
+        f + g + h in the last bit. Beyond two operands a running sum is kept (see _RunningSum).
+        """
+        running = _RunningSum if len(fs) > 2 else None
+        return NumericStepfun._combine(fs, operator.add, 0, left_assoc=False, running=running)
 
     @staticmethod
     def multiply(*fs: 'NumericStepfun') -> 'NumericStepfun':
         """Efficiently multiply multiple NumericStepfun objects in a single pass."""
         return NumericStepfun._combine(fs, operator.mul, 1, left_assoc=False)
 
+    @staticmethod
+    def minimum(*fs: 'NumericStepfun') -> 'NumericStepfun':
+        """Pointwise minimum of multiple NumericStepfun objects in a single pass (running heap)."""
+        return NumericStepfun._combine(fs, min, running=_RunningExtreme)
+
+    @staticmethod
+    def maximum(*fs: 'NumericStepfun') -> 'NumericStepfun':
+        """Pointwise maximum of multiple NumericStepfun objects in a single pass (running heap)."""
+        return NumericStepfun._combine(fs, max, running=lambda: _RunningExtreme(-1))
+
+    def map(self, fn: Callable[[Any], Any]) -> 'NumericStepfun':
+        """
+        Applies fn to every numeric value (one call per interval, not per point);
+        non-numeric values propagate unchanged. Equal neighbours are merged.
+        fn must return int or float (not bool), otherwise TypeError is raised.
+        """
+        def mapval(v):
+            if not self._is_number(v):
+                return v
+            w = fn(v)
+            if not self._is_number(w):
+                raise TypeError(f"map function must return int or float, got {type(w).__name__}.")
+            return w
+
+        return NumericStepfun(((t, mapval(v)) for t, v in self._tv_list), assume_sorted=True)
+
+    def clip(self, lo: Union[int, float, None] = None, hi: Union[int, float, None] = None) -> 'NumericStepfun':
+        """Limits the values to [lo, hi]; None means no bound on that side."""
+        if lo is not None and hi is not None and lo > hi:
+            raise ValueError("lo must be <= hi.")
+
+        def clipval(v):
+            if lo is not None and v < lo:
+                return lo
+            if hi is not None and v > hi:
+                return hi
+            return v
+
+        return self.map(clipval)
+
+    # Other operands return NotImplemented, so that their reflected operators (e.g. StepfunExpr) apply
+
     def __add__(self, other: 'NumericStepfun') -> 'NumericStepfun':
-        return NumericStepfun.sum(self, other)
+        if not isinstance(other, NumericStepfun):
+            return NotImplemented
+        return NumericStepfun._combine([self, other], operator.add, 0, left_assoc=False)
 
     def __mul__(self, other: 'NumericStepfun') -> 'NumericStepfun':
+        if not isinstance(other, NumericStepfun):
+            return NotImplemented
         return NumericStepfun.multiply(self, other)
 
     def __sub__(self, other: 'NumericStepfun') -> 'NumericStepfun':
+        if not isinstance(other, NumericStepfun):
+            return NotImplemented
+
         def sub(x, y):
             if not self._is_number(x):
                 return x
@@ -388,6 +1006,9 @@ class NumericStepfun(AbstractStepfun):
         return NumericStepfun._combine([self, other], sub, left_assoc=True)
 
     def __truediv__(self, other: 'NumericStepfun') -> 'NumericStepfun':
+        if not isinstance(other, NumericStepfun):
+            return NotImplemented
+
         def div(x, y):
             if not self._is_number(x):
                 return x
@@ -403,25 +1024,23 @@ class NumericStepfun(AbstractStepfun):
         def negval(v):
             return -v if self._is_number(v) else v
 
-        return NumericStepfun(((t, negval(v)) for t, v in self._tv_list))
+        return NumericStepfun(((t, negval(v)) for t, v in self._tv_list), assume_sorted=True)
 
     def __abs__(self) -> 'NumericStepfun':
         def absval(v):
             return abs(v) if self._is_number(v) else v
 
-        return NumericStepfun(((t, absval(v)) for t, v in self._tv_list))
+        return NumericStepfun(((t, absval(v)) for t, v in self._tv_list), assume_sorted=True)
 
     # --- Numeric comparisons: pointwise, True iff all intervals satisfy the comparison ---
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, NumericStepfun):
             return NotImplemented
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if v1 != v2:
-                return False
-        return True
+        # Canonical form is unique: equal functions have equal tv-lists
+        return self._tv_list == other._tv_list
+
+    __hash__ = AbstractStepfun.__hash__
 
     def __ne__(self, other: Any) -> bool:
         eq = self.__eq__(other)
@@ -430,44 +1049,16 @@ class NumericStepfun(AbstractStepfun):
         return not eq
 
     def __lt__(self, other: 'NumericStepfun') -> bool:
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if not (self._is_number(v1) and self._is_number(v2)):
-                return False
-            if not v1 < v2:
-                return False
-        return True
+        return self._holds(other, operator.lt, self._is_number)
 
     def __le__(self, other: 'NumericStepfun') -> bool:
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if not (self._is_number(v1) and self._is_number(v2)):
-                return False
-            if not v1 <= v2:
-                return False
-        return True
+        return self._holds(other, operator.le, self._is_number)
 
     def __gt__(self, other: 'NumericStepfun') -> bool:
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if not (self._is_number(v1) and self._is_number(v2)):
-                return False
-            if not v1 > v2:
-                return False
-        return True
+        return self._holds(other, operator.gt, self._is_number)
 
     def __ge__(self, other: 'NumericStepfun') -> bool:
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if not (self._is_number(v1) and self._is_number(v2)):
-                return False
-            if not v1 >= v2:
-                return False
-        return True
+        return self._holds(other, operator.ge, self._is_number)
 
 
 # End of NumericStepfun
@@ -487,44 +1078,49 @@ class BoolStepfun(AbstractStepfun):
     Supports logical operators (&, |, ^, ~), pointwise ordering, and N-ary logical operations.
     """
 
+    # Running aggregates for the counting ops: (number of True operands, k) -> result
+    _COUNTERS = {
+        operator.and_: lambda n_true, k: n_true == k,
+        operator.or_: lambda n_true, k: n_true > 0,
+        operator.xor: lambda n_true, k: n_true % 2 == 1,
+    }
+
     def _is_bool(self, x) -> bool:
         return isinstance(x, bool)
 
     @staticmethod
     def _combine(
             fs: Sequence['BoolStepfun'],
-            op: Callable,
-            left_assoc: bool = False
+            op: Callable
     ) -> 'BoolStepfun':
         if not fs:
             raise ValueError("At least one step function required.")
-        tv_lists = [f._tv_list for f in fs]
-        timestamps = AbstractStepfun.merge_timestamps(*tv_lists)
-        idxs = [0] * len(fs)
-        lengths = [len(tv) for tv in tv_lists]
+        # and/or/xor are decided by counting True operands, other ops reduce over all values
+        counter = BoolStepfun._COUNTERS.get(op)
+        k = len(fs)
+        n_true = 0
+        bad = set()  # indices of operands with a non-bool current value
         result = []
-        for t in timestamps:
-            current = []
-            for i, tv in enumerate(tv_lists):
-                while idxs[i] + 1 < lengths[i] and (
-                        float('-inf') if tv[idxs[i] + 1][0] is None else tv[idxs[i] + 1][0]) <= (
-                        float('-inf') if t is None else t):
-                    idxs[i] += 1
-                current.append(tv[idxs[i]][1])
-            for val in current:
-                if not isinstance(val, bool):
-                    v = val
-                    break
-            else:
-                if left_assoc:
-                    v = current[0]
-                    for val in current[1:]:
-                        v = op(v, val)
+        for t, current, changed in AbstractStepfun._sweep(fs):
+            for i, old in changed:
+                if isinstance(old, bool):
+                    n_true -= old
+                else:
+                    bad.discard(i)
+                val = current[i]
+                if isinstance(val, bool):
+                    n_true += val
                 else:
-                    v = functools.reduce(op, current)
+                    bad.add(i)
+            if bad:
+                v = current[min(bad)]
+            elif counter is not None:
+                v = counter(n_true, k)
+            else:
+                v = functools.reduce(op, current)
             if not result or result[-1][1] != v:
                 result.append((t, v))
-        return BoolStepfun(result)
+        return BoolStepfun._from_canonical(tuple(result))
 
     # Logical operators (binary)
     def __and__(self, other: 'BoolStepfun') -> 'BoolStepfun':
@@ -537,7 +1133,7 @@ class BoolStepfun(AbstractStepfun):
         return BoolStepfun._combine([self, other], operator.xor)
 
     def __invert__(self) -> 'BoolStepfun':
-        return BoolStepfun(((t, not v if isinstance(v, bool) else v) for t, v in self._tv_list))
+        return BoolStepfun(((t, not v if isinstance(v, bool) else v) for t, v in self._tv_list), assume_sorted=True)
 
     # N-ary logical operations
     @staticmethod
@@ -565,12 +1161,10 @@ class BoolStepfun(AbstractStepfun):
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, BoolStepfun):
             return NotImplemented
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if v1 != v2:
-                return False
-        return True
+        # Canonical form is unique: equal functions have equal tv-lists
+        return self._tv_list == other._tv_list
+
+    __hash__ = AbstractStepfun.__hash__
 
     def __ne__(self, other: Any) -> bool:
         eq = self.__eq__(other)
@@ -579,43 +1173,115 @@ class BoolStepfun(AbstractStepfun):
         return not eq
 
     def __lt__(self, other: 'BoolStepfun') -> bool:
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if not (isinstance(v1, bool) and isinstance(v2, bool)):
-                return False
-            if not v1 < v2:
-                return False
-        return True
+        return self._holds(other, operator.lt, self._is_bool)
 
     def __le__(self, other: 'BoolStepfun') -> bool:
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if not (isinstance(v1, bool) and isinstance(v2, bool)):
-                return False
-            if not v1 <= v2:
-                return False
-        return True
+        return self._holds(other, operator.le, self._is_bool)
 
     def __gt__(self, other: 'BoolStepfun') -> bool:
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if not (isinstance(v1, bool) and isinstance(v2, bool)):
-                return False
-            if not v1 > v2:
-                return False
-        return True
+        return self._holds(other, operator.gt, self._is_bool)
 
     def __ge__(self, other: 'BoolStepfun') -> bool:
-        all_timestamps = AbstractStepfun.merge_timestamps(self._tv_list, other._tv_list)
-        for t in all_timestamps:
-            v1, v2 = self(float('-inf') if t is None else t), other(float('-inf') if t is None else t)
-            if not (isinstance(v1, bool) and isinstance(v2, bool)):
-                return False
-            if not v1 >= v2:
-                return False
-        return True
+        return self._holds(other, operator.ge, self._is_bool)
 
 # End of BoolStepfun
+
+
+# StepfunBuilder: streaming construction of step functions from ordered event feeds.
+
+class StepfunBuilder:
+    """
+    Builds a step function from (timestamp, value) events arriving in ascending
+    timestamp order. Every event is normalized on the fly in O(1): a repeated
+    timestamp replaces the previous value (last value wins) and a value equal to
+    the current one adds no breakpoint. Raw events are never buffered; memory is
+    proportional to the normalized result, or to one chunk (see chunks).
+    cls is the step function class to build; None infers it as make_stepfun does.
+    """
+
+    def __init__(self, cls: type = None):
+        self._cls = cls
+        self._tv = []  # normalized pairs, _tv[0] has timestamp None
+        self._prev = None  # last timestamp added
+
+    def add(self, t: Timestamp, v: Any) -> None:
+        """Adds one event; t must not be smaller than the previous timestamp."""
+        tv = self._tv
+        if t is None or t == "-oo":
+            if tv:
+                raise ValueError("Only the first timestamp may be None or '-oo'.")
+            tv.append((None, v))
+            return
+        if not isinstance(t, (int, float)):
+            raise TypeError("Timestamps must be int, float, None, or '-oo'.")
+        if not tv:
+            # If first timestamp isn't None, insert (None, value) with same value as first
+            tv.append((None, v))
+        elif self._prev is not None and t < self._prev:
+            raise ValueError("tv_list is not sorted by timestamp.")
+        self._prev = t
+        if tv[-1][0] == t:
+            tv.pop()
+        if not tv or tv[-1][1] != v:
+            tv.append((t, v))
+
+    def extend(self, events: Iterable[TvPair]) -> 'StepfunBuilder':
+        for pair in events:
+            if not (isinstance(pair, tuple) and len(pair) == 2):
+                raise TypeError("Each tv-pair must be a tuple (timestamp, value).")
+            self.add(*pair)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._tv)
+
+    @property
+    def tv_list(self) -> Tuple[TvPair, ...]:
+        if not self._tv:
+            raise ValueError("tv_list must not be empty.")
+        return tuple(self._tv)
+
+    def build(self) -> AbstractStepfun:
+        return self._make(self.tv_list)
+
+    def _make(self, tv: Tuple[TvPair, ...]) -> AbstractStepfun:
+        if self._cls is None:
+            return AbstractStepfun.make_stepfun(tv, assume_sorted=True)
+        return self._cls._from_canonical(tv)
+
+    def _take_chunk(self, size: int) -> AbstractStepfun:
+        # Split off the first size breakpoints; the next chunk starts with (None, last value)
+        tv = self._tv
+        chunk = tuple(tv[:size + 1])
+        self._tv = [(None, chunk[-1][1])] + tv[size + 1:]
+        return self._make(chunk)
+
+    @staticmethod
+    def chunks(events: Iterable[TvPair], size: int, cls: type = None):
+        """
+        Generator of step functions with at most size breakpoints each (besides the
+        leading None pair), built from an unbounded event feed in O(size) memory.
+        Each chunk starts with (None, value of the previous chunk's last breakpoint),
+        so it agrees with the full step function up to the next chunk's first
+        breakpoint, and the chunks' tv_list[1:] concatenate to the full tv_list[1:].
+        """
+        if size < 1:
+            raise ValueError("Chunk size must be positive.")
+        builder = StepfunBuilder(cls)
+        for pair in events:
+            builder.extend((pair,))
+            # Only the last pair may still change, so everything before it is final
+            if len(builder) >= size + 2:
+                yield builder._take_chunk(size)
+        if builder._tv:
+            yield builder.build()
+
+
+def memoize_op(op: Callable, maxsize: int = 1024) -> Callable:
+    """
+    LRU-memoized version of an operation on step functions, e.g.
+    add = memoize_op(operator.add); add(f, g). Results are cached by the
+    structural hash of the operands (computed once per step function), so
+    repeated sub-expressions over the same base curves are computed once.
+    """
+    return functools.lru_cache(maxsize=maxsize)(op)
@@ -0,0 +1,125 @@
+# project owner: Johannes Siedersleben
+#
+# =============================================================================
+# Binary Storage Format for Step Functions
+#
+# Pickling the tuple lists of `NumericStepfun` / `BoolStepfun` is slow and
+# needs several Python objects per breakpoint. This module stores a step
+# function as a fixed 32-byte header followed by two raw little-endian arrays:
+#
+#   offset  size  content
+#        0     8  magic b'STEPFUN\x01'
+#        8     8  NumPy dtype string of the values, NUL-padded ('<f8', '<i8', '|b1')
+#       16     8  n, the number of breakpoints (uint64)
+#       24     8  reserved (zero)
+#       32    8n  breakpoints, float64, ascending, the first one is -inf (None)
+#   32+8n  n*s   values, one per breakpoint (s = itemsize of the dtype)
+#
+# The file holds the canonical form, so loading does not normalize. With
+# `mmap=True` both arrays are `numpy.memmap`s: an `ArrayStepfun` over a
+# file of any size opens in O(1) and evaluation reads only the pages that
+# binary search touches.
+#
+# Values must be all bool, all int (stored as int64) or all numeric (stored
+# as float64; ints become floats). Non-numeric values cannot be stored.
+#
+# Usage Overview:
+# ---------------
+#     f.save('curve.stf')                               # NumericStepfun / BoolStepfun
+#     g = AbstractStepfun.load('curve.stf')             # same class and values
+#     a = ArrayStepfun.load('curve.stf')                # memory-mapped, zero-copy
+#     ys = a.evaluate_many(xs)
+# =============================================================================
+
+import struct
+from array import array
+from typing import Tuple, Union
+
+import numpy as np
+
+from sandbox.stepfunctions.stepfun import AbstractStepfun, NumericStepfun, BoolStepfun
+from sandbox.stepfunctions.arraystepfun import ArrayStepfun
+
+MAGIC = b'STEPFUN\x01'
+_HEADER = struct.Struct('<8s8sQ8x')
+_DTYPES = ('<f8', '<i8', '|b1')
+
+
+def _value_dtype(values: list) -> str:
+    if all(isinstance(v, bool) for v in values):
+        return '|b1'
+    if all(isinstance(v, int) and not isinstance(v, bool) and -2 ** 63 <= v < 2 ** 63 for v in values):
+        return '<i8'
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return '<f8'
+    raise TypeError("Only step functions with all bool or all numeric values can be stored.")
+
+
+def save(f: Union[AbstractStepfun, ArrayStepfun], path) -> None:
+    """Writes f to path in the binary format described in the module comment."""
+    if isinstance(f, ArrayStepfun):
+        times, values = f.times, f.values
+        dtype = '|b1' if values.dtype == bool else '<f8'
+    elif isinstance(f, AbstractStepfun):
+        if not isinstance(f._times, array):
+            raise ValueError("Timestamps beyond the precision of float64 cannot be stored.")
+        times = np.frombuffer(f._times, dtype=np.float64)
+        values = [v for _, v in f.tv_list]
+        dtype = _value_dtype(values)
+    else:
+        raise TypeError("save requires a step function.")
+    with open(path, 'wb') as fh:
+        fh.write(_HEADER.pack(MAGIC, dtype.encode('ascii'), len(times)))
+        fh.write(np.ascontiguousarray(times, dtype='<f8').tobytes())
+        fh.write(np.asarray(values, dtype=dtype).tobytes())
+
+
+def _read_header(path) -> Tuple[np.dtype, int]:
+    with open(path, 'rb') as fh:
+        header = fh.read(_HEADER.size)
+        fh.seek(0, 2)
+        size = fh.tell()
+    if len(header) < _HEADER.size:
+        raise ValueError(f"{path}: not a step function file (header too short).")
+    magic, dtype, n = _HEADER.unpack(header)
+    dtype = dtype.rstrip(b'\0').decode('ascii', 'replace')
+    if magic != MAGIC or dtype not in _DTYPES:
+        raise ValueError(f"{path}: not a step function file.")
+    dtype = np.dtype(dtype)
+    if n == 0 or size != _HEADER.size + n * (8 + dtype.itemsize):
+        raise ValueError(f"{path}: file size does not match header (truncated file?).")
+    return dtype, n
+
+
+def _read_arrays(path, mmap: bool) -> Tuple[np.ndarray, np.ndarray]:
+    dtype, n = _read_header(path)
+    if mmap:
+        times = np.memmap(path, dtype='<f8', mode='r', offset=_HEADER.size, shape=(n,))
+        values = np.memmap(path, dtype=dtype, mode='r', offset=_HEADER.size + 8 * n, shape=(n,))
+        return times, values
+    with open(path, 'rb') as fh:
+        fh.seek(_HEADER.size)
+        times = np.fromfile(fh, dtype='<f8', count=n)
+        values = np.fromfile(fh, dtype=dtype, count=n)
+    return times, values
+
+
+def load(path, mmap: bool = True) -> ArrayStepfun:
+    """
+    Opens a stored step function as an ArrayStepfun. With mmap (default) the arrays
+    are read-only memory maps of the file (int64 values are converted to float64,
+    which reads them once).
+    """
+    times, values = _read_arrays(path, mmap)
+    if values.dtype != bool and values.dtype != np.float64:
+        values = values.astype(np.float64)
+    return ArrayStepfun._from_canonical(times, values)
+
+
+def load_stepfun(path) -> AbstractStepfun:
+    """Reads a stored step function into a NumericStepfun or BoolStepfun."""
+    times, values = _read_arrays(path, mmap=False)
+    times = times.tolist()
+    times[0] = None
+    cls = BoolStepfun if values.dtype == bool else NumericStepfun
+    return cls._from_canonical(tuple(zip(times, values.tolist())))
@@ -0,0 +1,130 @@
+# project owner: Johannes Siedersleben
+#
+# Test driver for ArrayStepfun, the columnar NumPy backend. Every operation
+# is checked against the tuple-based NumericStepfun/BoolStepfun on random
+# step functions.
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sandbox.stepfunctions.arraystepfun import ArrayStepfun
+from sandbox.stepfunctions.stepfun import NumericStepfun, BoolStepfun
+
+
+def random_tv(rnd, n, values):
+    stamps = [rnd.randint(-50, 50) for _ in range(n)]  # unsorted, with duplicates
+    return [(t, rnd.choice(values)) for t in stamps]
+
+
+def make_pairs(k, seed, values=(-1.5, 0.0, 1.0, 2.0)):
+    rnd = random.Random(seed)
+    tvs = [random_tv(rnd, rnd.randint(1, 30), values) for _ in range(k)]
+    return [(ArrayStepfun(tv), NumericStepfun(tv) if values[0] is not True else BoolStepfun(tv)) for tv in tvs]
+
+
+pairs = make_pairs(12, seed=1)
+bool_pairs = make_pairs(8, seed=2, values=(True, False))
+xs = [x / 2 for x in range(-120, 120)]
+
+
+@pytest.mark.parametrize("a, f", pairs + bool_pairs)
+def test_normalization_matches_stepfun(a, f):
+    assert a.tv_list == f.tv_list
+    assert ArrayStepfun.from_arrays(a.times, a.values) == a
+    assert a.to_stepfun() == f
+
+
+def test_construction_details():
+    a = ArrayStepfun([(10, 2), (0, 1), (5, 1), (10, 3), ("-oo", 1)])
+    assert a.tv_list == ((None, 1.0), (10.0, 3.0))
+    assert a.values.dtype == np.float64 and len(a) == 2
+    with pytest.raises(ValueError):
+        ArrayStepfun([])
+    with pytest.raises(TypeError):
+        ArrayStepfun([(None, 1), (2, "DIV/0")])
+
+
+@pytest.mark.parametrize("a, f", pairs)
+def test_evaluation(a, f):
+    assert a.evaluate_many(xs).tolist() == [f(x) for x in xs]
+    assert [a(x) for x in xs[::17]] == [f(x) for x in xs[::17]]
+
+
+@pytest.mark.parametrize("i", range(len(pairs) - 1))
+def test_arithmetic_matches_stepfun(i):
+    (a, f), (b, g) = pairs[i], pairs[i + 1]
+    assert (a + b).tv_list == (f + g).tv_list
+    assert (a - b).tv_list == (f - g).tv_list
+    assert (a * b).tv_list == (f * g).tv_list
+    assert (-a).tv_list == (-f).tv_list
+    assert abs(a).tv_list == abs(f).tv_list
+    assert ArrayStepfun.sum(*(p[0] for p in pairs)).evaluate_many(xs) == pytest.approx(
+        NumericStepfun.sum(*(p[1] for p in pairs)).evaluate_many(xs))
+
+
+def test_division_ieee():
+    a = ArrayStepfun([(None, 1.0)])
+    b = ArrayStepfun([(None, 2.0), (0, 0.0)])
+    assert (a / b).tv_list == ((None, 0.5), (0.0, float('inf')))
+
+
+@pytest.mark.parametrize("i", range(len(bool_pairs) - 1))
+def test_logic_matches_stepfun(i):
+    (a, f), (b, g) = bool_pairs[i], bool_pairs[i + 1]
+    assert (a & b).tv_list == (f & g).tv_list
+    assert (a | b).tv_list == (f | g).tv_list
+    assert (a ^ b).tv_list == (f ^ g).tv_list
+    assert (~a).tv_list == (~f).tv_list
+    with pytest.raises(TypeError):
+        a + b
+
+
+@pytest.mark.parametrize("a, f", pairs)
+@pytest.mark.parametrize("window", [(-60, 60), (-3.5, 7), (4, 4), (49, 51)])
+def test_integrate(a, f, window):
+    assert a.integrate(*window) == pytest.approx(f.integrate(*window))
+
+
+@pytest.mark.parametrize("i", range(len(pairs) - 1))
+def test_comparisons_match_stepfun(i):
+    (a, f), (b, g) = pairs[i], pairs[i + 1]
+    c, h = ArrayStepfun(a + ArrayStepfun([(None, 10.0)])), f + NumericStepfun([(None, 10.0)])
+    for (x, u), (y, v) in [((a, f), (b, g)), ((a, f), (c, h)), ((c, h), (a, f)), ((a, f), (a, f))]:
+        assert (x == y, x < y, x <= y, x > y, x >= y) == (u == v, u < v, u <= v, u > v, u >= v)
+
+
+@pytest.mark.parametrize("a, f", pairs + bool_pairs)
+@pytest.mark.parametrize("window", [(-10, 10), (-60, 60), (3, 3.5), (None, 0), (0, None), (None, None), (5, -5)])
+def test_restrict_matches_stepfun(a, f, window):
+    fill = False if a.values.dtype == bool else -7.0
+    assert a.restrict(*window, fill=fill).tv_list == f.restrict(*window, fill=fill).tv_list
+    if fill is not False:
+        r = a[window[0]:window[1]]
+        lo = float('-inf') if window[0] is None else window[0]
+        hi = float('inf') if window[1] is None else window[1]
+        for x in xs:
+            assert r(x) == a(x) if lo <= x < hi else np.isnan(r(x))
+
+
+def test_restrict_bool_needs_fill():
+    with pytest.raises(ValueError):
+        ArrayStepfun([(None, True)]).restrict(0, 1)
+
+
+@pytest.mark.parametrize("i", range(0, 10, 2))
+def test_minimum_maximum_match_stepfun(i):
+    (a, f), (b, g), (c, h) = pairs[i], pairs[i + 1], pairs[i + 2]
+    assert ArrayStepfun.minimum(a, b, c).tv_list == NumericStepfun.minimum(f, g, h).tv_list
+    assert ArrayStepfun.maximum(a, b, c).tv_list == NumericStepfun.maximum(f, g, h).tv_list
+
+
+@pytest.mark.parametrize("a, f", pairs)
+def test_map_and_clip_match_stepfun(a, f):
+    assert a.clip(0.0, 1.0).tv_list == f.clip(0.0, 1.0).tv_list
+    assert a.map(np.square).tv_list == f.map(lambda v: v * v).tv_list
+    assert a.map(lambda v: v > 0).values.dtype == bool
+    with pytest.raises(ValueError):
+        a.map(np.sum)
@@ -0,0 +1,73 @@
+# project owner: Johannes Siedersleben
+#
+# Test driver for StepfunCollection: cross-sections, panels and sums across
+# many random step functions, checked against evaluating each function.
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sandbox.stepfunctions.stepfun import NumericStepfun, BoolStepfun
+from sandbox.stepfunctions.arraystepfun import ArrayStepfun
+from sandbox.stepfunctions.collection import StepfunCollection
+
+
+def random_funs(m, seed, values=(-2, -1, 0, 1.5, 3)):
+    rnd = random.Random(seed)
+    funs = {}
+    for i in range(m):
+        stamps = sorted(rnd.sample(range(-100, 100), rnd.choice([0, 1, 3, 40, 150])))
+        funs[f"e{i}"] = NumericStepfun([(None, rnd.choice(values))] + [(t, rnd.choice(values)) for t in stamps])
+    return funs
+
+
+points = [-1000, -100, -99.5, -1, 0, 0.5, 1, 42, 99, 99.5, 1000, float('-inf'), float('inf')]
+
+
+@pytest.mark.parametrize("m, seed", [(1, 0), (7, 1), (300, 2)])
+def test_cross_section_and_panel(m, seed):
+    funs = random_funs(m, seed)
+    coll = StepfunCollection(funs)
+    assert len(coll) == m and coll.keys == list(funs)
+    for t in points:
+        assert coll.at(t).tolist() == [f(t) for f in funs.values()]
+        assert coll.sum_at(t) == pytest.approx(sum(f(t) for f in funs.values()))
+    panel = coll.panel(points)
+    assert panel.shape == (m, len(points))
+    assert panel.tolist() == [[f(t) for t in points] for f in funs.values()]
+    assert coll.sum_at(points) == pytest.approx(panel.sum(axis=0))
+
+
+def test_getitem_is_view():
+    funs = random_funs(20, seed=3)
+    coll = StepfunCollection(funs.items())
+    for key, f in funs.items():
+        g = coll[key]
+        assert g == ArrayStepfun(f) and g.times.base is not None
+    assert "e3" in coll and "x" not in coll
+    with pytest.raises(KeyError):
+        coll["x"]
+
+
+def test_bool_collection():
+    coll = StepfunCollection([(1, BoolStepfun([(None, False), (0, True)])),
+                              (2, BoolStepfun([(None, True), (5, False)]))])
+    assert coll.at(3).tolist() == [True, True]
+    assert coll.sum_at(-1) == 1 and coll.sum_at(7) == 1
+    with pytest.raises(TypeError):
+        StepfunCollection([(1, BoolStepfun([(None, True)])), (2, NumericStepfun([(None, 1)]))])
+
+
+def test_empty_and_duplicate_keys():
+    coll = StepfunCollection({})
+    assert len(coll) == 0 and coll.at(1.0).shape == (0,) and coll.sum_at(1.0) == 0
+    with pytest.raises(ValueError):
+        StepfunCollection([("a", NumericStepfun([(None, 1)])), ("a", NumericStepfun([(None, 2)]))])
+
+
+def test_rejects_inexact_timestamps():
+    f = NumericStepfun([(None, 0), (2 ** 60, 1), (2 ** 60 + 1, 2)])
+    with pytest.raises(ValueError, match="'a'"):
+        StepfunCollection({"b": NumericStepfun([(None, 1)]), "a": f})
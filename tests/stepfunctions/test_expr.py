@@ -0,0 +1,56 @@
+# project owner: Johannes Siedersleben
+#
+# Test driver for StepfunExpr: fused formulas must give exactly the same
+# step functions as the chained NumericStepfun operators.
+
+import random
+
+import pytest
+
+from sandbox.stepfunctions.expr import StepfunExpr
+from sandbox.stepfunctions.stepfun import NumericStepfun
+
+
+def make_funs(k, seed, values=(-2, -1, 0, 1, 2, 3.5, "n/a")):
+    rnd = random.Random(seed)
+    return [NumericStepfun([(None, rnd.choice(values))] + [(t, rnd.choice(values)) for t in rnd.sample(range(100), 15)])
+            for _ in range(k)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fused_matches_chained(seed):
+    a, b, c, d, e = make_funs(5, seed)
+    chained = (a + b) * c - d / e
+    fused = (StepfunExpr(a) + b) * c - StepfunExpr(d) / e
+    assert fused.materialize().tv_list == chained.tv_list
+    for x in [-1, 0, 17.5, 99, 200]:
+        assert fused(x) == chained(x)
+
+
+def test_repeated_leaves_and_constants():
+    a, b = make_funs(2, seed=9)
+    two = NumericStepfun([(None, 2)])
+    e = abs(-(2 * StepfunExpr(a) - StepfunExpr(a) / b)) + 1
+    assert e.leaves == (a, b)
+    assert str(e) == "(abs(-((2 * f0) - (f0 / f1))) + 1)"
+    assert e.materialize().tv_list == (abs(-(two * a - a / b)) + NumericStepfun([(None, 1)])).tv_list
+
+
+def test_stepfun_on_the_left_records_node():
+    g, h = make_funs(2, seed=4)
+    for e, chained in [(g + StepfunExpr(h), g + h), (g - StepfunExpr(h), g - h),
+                       (g * StepfunExpr(h), g * h), (g / StepfunExpr(h), g / h)]:
+        assert isinstance(e, StepfunExpr) and e.leaves == (g, h)
+        assert e.materialize().tv_list == chained.tv_list
+    with pytest.raises(TypeError):
+        g + "x"
+
+
+def test_compile_and_errors():
+    a, b = make_funs(2, seed=3)
+    leaves, fn = (StepfunExpr(a) / b).compile()
+    assert leaves == (a, b)
+    assert fn([1, 0]) == "DIV/0" and fn(["x", 0]) == "x" and fn([3, 2]) == 1.5
+    assert StepfunExpr(3).materialize().tv_list == ((None, 3),)
+    with pytest.raises(TypeError):
+        StepfunExpr("a")
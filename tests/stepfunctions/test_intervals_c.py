@@ -0,0 +1,212 @@
+# project owner: Johannes Siedersleben
+#
+# Test driver for the indexed queries and statistics of Intervals. Results on
+# random interval sets are checked against brute force over the interval list.
+
+import random
+
+import pytest
+
+from sandbox.stepfunctions.intervals import Intervals
+from sandbox.stepfunctions.stepfun import BoolStepfun
+
+
+def random_intervals(n, seed, span=1000):
+    rnd = random.Random(seed)
+    ivs = []
+    for _ in range(n):
+        left = rnd.randint(-span, span)
+        ivs.append((left, left + rnd.randint(1, span // 10)))
+    if seed % 3 == 0:
+        ivs.append((None, -span))
+    if seed % 4 == 0:
+        ivs.append((span, None))
+    return Intervals(ivs)
+
+
+sets = [Intervals([]), Intervals([(None, None)]), Intervals([(0, 1)]), Intervals([(None, 0), (5, None)])]
+sets += [random_intervals(n, seed) for n, seed in [(3, 1), (40, 3), (200, 4), (1000, 12)]]
+windows = [(-2000, 2000), (0, 1), (-5, 5), (3.5, 3.75), (None, 0), (0, None), (None, None), (7, 7), (9, 2)]
+
+
+def brute_meets(iv, a, b):
+    lo = float('-inf') if a is None else a
+    hi = float('inf') if b is None else b
+    result = []
+    for left, right in iv.intervals:
+        l = float('-inf') if left is None else left
+        r = float('inf') if right is None else right
+        if lo < hi and l < hi and r > lo:
+            result.append((left, right))
+    return tuple(result)
+
+
+@pytest.mark.parametrize("iv", sets)
+def test_contains(iv):
+    xs = [-3000, -1000, -1000.5, -1, 0, 0.5, 1, 5, 17.25, 999, 1000, 3000] + [l for l, _ in iv.intervals if l]
+    for x in xs:
+        expected = any((l is None or l <= x) and (r is None or x < r) for l, r in iv.intervals)
+        assert iv.contains(x) is expected and iv(x) is expected
+    assert list(iv.contains_many(xs)) == [iv.contains(x) for x in xs]
+
+
+def test_contains_many_reuses_value_array():
+    pytest.importorskip("numpy")
+    iv = Intervals([(0, 1), (2, 3)])
+    assert iv.contains_many([0.5, 1.5, 2]).tolist() == [True, False, True]
+    cached = iv._stepfun._values
+    assert cached is not None and cached.dtype == bool
+    assert iv.contains_many([5]).tolist() == [False]
+    assert iv._stepfun._values is cached
+
+
+@pytest.mark.parametrize("iv", sets)
+@pytest.mark.parametrize("window", windows)
+def test_overlaps_and_count(iv, window):
+    expected = brute_meets(iv, *window)
+    assert iv.overlaps(*window) == expected
+    assert iv.count_in(*window) == len(expected)
+
+
+def test_overlaps_keeps_endpoints():
+    iv = Intervals([(0, 10), (20, 30), (40, None)])
+    assert iv.overlaps(5, 25) == ((0, 10), (20, 30))
+    assert iv.overlaps(10, 20) == ()
+    assert iv.overlaps(30, 41) == iv.intervals[2:]
+    assert iv.count_in(None, None) == 3
+    assert Intervals.from_stepfun(BoolStepfun([(None, True), (0, False)])).overlaps(-1, 0) == ((None, 0),)
+
+
+def quadratic_stepfun_to_intervals(stepfun):
+    # The former nested scan, as a reference
+    tv = list(stepfun.tv_list)
+    intervals = []
+    for i, (t, v) in enumerate(tv):
+        if v:
+            right = next((t2 for t2, v2 in tv[i + 1:] if not v2), None)
+            intervals.append((t, right))
+    return tuple(intervals)
+
+
+@pytest.mark.parametrize("iv", sets)
+def test_intervals_linear_and_cached(iv):
+    assert iv.intervals == quadratic_stepfun_to_intervals(iv.stepfun)
+    assert iv.intervals is iv.intervals
+    assert Intervals(iv.intervals) == iv
+    assert str(iv) == f"Intervals{iv.intervals}"
+
+
+def test_intervals_of_derived_sets():
+    a, b = sets[5], sets[6]
+    for c in [a | b, a & b, a - b, -a, Intervals.union(a, b)]:
+        assert c._intervals is None
+        assert c.intervals == quadratic_stepfun_to_intervals(c.stepfun)
+        assert c._intervals is c.intervals
+    alternating = Intervals([(2 * k, 2 * k + 1) for k in range(100_000)])
+    assert len(alternating.intervals) == 100_000 and alternating.intervals[-1] == (199_998, 199_999)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_from_arrays_matches_constructor(seed):
+    np = pytest.importorskip("numpy")
+    rnd = random.Random(seed)
+    pairs = [(rnd.randint(-100, 100), rnd.randint(-100, 100)) for _ in range(rnd.choice([1, 5, 50, 500]))]
+    pairs += [(None, -90)] * (seed % 2) + [(95, None)] * (seed % 3 == 0) + [(7, 7)]
+    expected = Intervals(pairs)
+    lefts = np.array([np.nan if l is None else l for l, _ in pairs], dtype=float)
+    rights = np.array([np.nan if r is None else r for _, r in pairs], dtype=float)
+    iv = Intervals.from_arrays(lefts, rights)
+    assert iv == expected and iv.stepfun.tv_list == BoolStepfun(iv.stepfun.tv_list).tv_list
+    assert iv.intervals == expected.intervals
+    ordered = sorted((min(l, r), max(l, r)) for l, r in zip(lefts.tolist(), rights.tolist())
+                     if not (np.isnan(l) or np.isnan(r)))
+    if ordered:
+        l, r = map(np.array, zip(*ordered))
+        assert Intervals.from_arrays(l, r, assume_sorted=True) == Intervals(ordered)
+
+
+def test_from_arrays_edge_cases():
+    np = pytest.importorskip("numpy")
+    assert Intervals.from_arrays([], []) == Intervals([])
+    assert Intervals.from_arrays([1, 2], [1, 2]) == Intervals([])
+    assert Intervals.from_arrays([0, 1], [1, 2]) == Intervals([(0, 2)])
+    assert Intervals.from_arrays([-np.inf], [np.inf]) == Intervals([(None, None)])
+    with pytest.raises(ValueError):
+        Intervals.from_arrays([2, 1], [3, 4], assume_sorted=True)
+    with pytest.raises(ValueError):
+        Intervals.from_arrays([1, 2], [3])
+
+
+def brute_measure(iv, a, b):
+    lo = float('-inf') if a is None else a
+    hi = float('inf') if b is None else b
+    total = 0.0
+    for left, right in iv.intervals:
+        l = float('-inf') if left is None else left
+        r = float('inf') if right is None else right
+        if min(r, hi) > max(l, lo):
+            total += min(r, hi) - max(l, lo)
+    return total
+
+
+@pytest.mark.parametrize("iv", sets)
+@pytest.mark.parametrize("window", [w for w in windows if w != (9, 2)] + [(-1000.5, 999.5), (1, 2)])
+def test_measure_matches_brute(iv, window):
+    assert iv.measure(*window) == pytest.approx(brute_measure(iv, *window))
+
+
+@pytest.mark.parametrize("iv", sets)
+def test_gap_statistics(iv):
+    ivs = iv.intervals
+    assert iv.n_components() == len(ivs)
+    assert iv.gaps() == tuple((r, l) for (_, r), (l, _) in zip(ivs, ivs[1:]))
+    if len(ivs) < 2:
+        assert iv.largest_gap() is None
+    else:
+        l, r = iv.largest_gap()
+        assert r - l == max(r2 - l2 for l2, r2 in iv.gaps())
+    assert iv.coverage(-500, 500) == pytest.approx(brute_measure(iv, -500, 500) / 1000)
+
+
+def test_statistics_examples():
+    iv = Intervals([(0, 10), (20, 25), (40, 100)])
+    assert iv.measure(5, 45) == 5 + 5 + 5
+    assert iv.measure() == 75 and iv.coverage(0, 100) == 0.75
+    assert iv.gaps() == ((10, 20), (25, 40)) and iv.largest_gap() == (25, 40)
+    assert Intervals([(None, 0)]).measure(-3, 1) == 3 and Intervals([(None, 0)]).measure() == float('inf')
+    with pytest.raises(ValueError):
+        iv.measure(2, 1)
+    with pytest.raises(ValueError):
+        iv.coverage(None, 5)
+
+
+def replica_sets(n, seed):
+    return [random_intervals(random.Random(seed + i).randint(0, 30), seed + i) for i in range(n)]
+
+
+@pytest.mark.parametrize("n, seed", [(1, 0), (2, 5), (7, 11), (60, 23)])
+def test_at_least_matches_counting(n, seed):
+    ivs = replica_sets(n, seed)
+    points = sorted({t for iv in ivs for t, _ in iv.stepfun.tv_list[1:] if t != float('inf')})
+    points = [-5000] + points + [p + 0.5 for p in points]
+    for k in sorted({0, 1, 2, n // 2, n, n + 1}):
+        result = Intervals.at_least(k, *ivs)
+        assert result.stepfun.tv_list == BoolStepfun(result.stepfun.tv_list).tv_list
+        for x in points:
+            assert result(x) is (sum(iv(x) for iv in ivs) >= k)
+
+
+@pytest.mark.parametrize("n, seed", [(1, 0), (2, 5), (7, 11), (60, 23)])
+def test_union_intersection_match_stepfun(n, seed):
+    ivs = replica_sets(n, seed)
+    assert Intervals.union(*ivs).stepfun.tv_list == BoolStepfun.logical_or(*(iv.stepfun for iv in ivs)).tv_list
+    assert Intervals.intersection(*ivs).stepfun.tv_list == \
+        BoolStepfun.logical_and(*(iv.stepfun for iv in ivs)).tv_list
+
+
+def test_at_least_examples():
+    a, b, c = Intervals([(0, 10)]), Intervals([(5, 15)]), Intervals([(None, 7), (12, None)])
+    assert Intervals.at_least(2, a, b, c) == Intervals([(0, 10), (12, 15)])
+    assert Intervals.at_least(3, a, b, c) == Intervals([(5, 7)])
+    assert Intervals.at_least(0, a) == -Intervals([])
+    assert Intervals.at_least(1) == Intervals([]) == Intervals.union() == Intervals.intersection()
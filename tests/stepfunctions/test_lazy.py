@@ -0,0 +1,65 @@
+# project owner: Johannes Siedersleben
+#
+# Test driver for LazyStepfun: lazy pipelines must give exactly the same
+# step functions as the eager operators, and must not read further into
+# their sources than needed.
+
+import random
+
+import pytest
+
+from sandbox.stepfunctions.lazy import LazyStepfun
+from sandbox.stepfunctions.stepfun import NumericStepfun, BoolStepfun
+
+
+def make_funs(cls, k, seed, values):
+    rnd = random.Random(seed)
+    return [cls([(None, rnd.choice(values))] + [(t, rnd.choice(values)) for t in rnd.sample(range(100), 12)])
+            for _ in range(k)]
+
+
+nums = make_funs(NumericStepfun, 5, seed=1, values=(-2, -1, 0, 1, 2, 3, "n/a"))
+bools = make_funs(BoolStepfun, 4, seed=2, values=(True, False))
+
+
+def test_arithmetic_pipeline_matches_eager():
+    a, b, c, d, e = nums
+    eager = (a + b * c - d / e) * abs(-a)
+    lazy = (LazyStepfun(a) + LazyStepfun(b) * c - LazyStepfun(d) / e) * abs(-LazyStepfun(a))
+    assert lazy.materialize().tv_list == eager.tv_list
+    assert LazyStepfun.sum(*nums).materialize().tv_list == NumericStepfun.sum(*nums).tv_list
+    assert LazyStepfun.multiply(*nums).materialize().tv_list == NumericStepfun.multiply(*nums).tv_list
+
+
+def test_logic_pipeline_matches_eager():
+    p, q, r, s = bools
+    eager = (p & ~q) | (r ^ s)
+    lazy = (LazyStepfun(p) & ~LazyStepfun(q)) | (LazyStepfun(r) ^ s)
+    assert lazy.materialize().tv_list == eager.tv_list
+    assert LazyStepfun.logical_and(*bools).materialize() == BoolStepfun.logical_and(*bools)
+    assert LazyStepfun.logical_or(*bools).materialize() == BoolStepfun.logical_or(*bools)
+
+
+def test_evaluation_reads_only_a_prefix():
+    pulled = []
+
+    def source():
+        for t in [None] + list(range(1000)):
+            pulled.append(t)
+            yield t, (t or 0) % 3
+
+    lazy = LazyStepfun._from_source(source, NumericStepfun) + NumericStepfun([(None, 10)])
+    assert lazy(5.5) == 12
+    assert len(pulled) < 10
+    assert list(lazy)[:3] == [(None, 10), (1, 11), (2, 12)]
+
+
+def test_reiterable_and_type_checks():
+    lazy = LazyStepfun(nums[0]) + nums[1]
+    assert list(lazy) == list(lazy)
+    with pytest.raises(TypeError):
+        LazyStepfun(nums[0]) & bools[0]
+    with pytest.raises(TypeError):
+        ~LazyStepfun(nums[0])
+    with pytest.raises(ValueError):
+        LazyStepfun.sum()
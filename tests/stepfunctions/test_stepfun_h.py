@@ -0,0 +1,427 @@
+# project owner: Johannes Siedersleben
+#
+# Test driver for the performance-oriented internals of AbstractStepfun:
+# cached breakpoint array, evaluation and integration. Results are checked
+# against naive reference implementations on random step functions.
+
+import math
+import operator
+import random
+
+import pytest
+
+from sandbox.stepfunctions import stepfun
+from sandbox.stepfunctions.stepfun import AbstractStepfun, NumericStepfun, BoolStepfun, StepfunBuilder
+
+
+def make_random_stepfun(n, seed):
+    rnd = random.Random(seed)
+    stamps = sorted(rnd.sample(range(-500, 500), n))
+    values = [rnd.randint(-5, 5) for _ in range(n)]
+    return NumericStepfun([(None, values[0])] + list(zip(stamps, values)))
+
+
+def naive_eval(f, x):
+    value = f.tv_list[0][1]
+    for t, v in f.tv_list[1:]:
+        if t <= x:
+            value = v
+    return value
+
+
+def naive_integrate(f, start, end):
+    cuts = sorted({start, end} | {t for t, _ in f.tv_list[1:] if start < t < end})
+    return sum((x1 - x0) * naive_eval(f, x0) for x0, x1 in zip(cuts, cuts[1:]))
+
+
+funs = [make_random_stepfun(n, seed) for n, seed in [(1, 0), (2, 1), (10, 2), (50, 3)]]
+points = [-1000, -500, -499.5, -1, 0, 0.5, 1, 17, 250, 499, 1000, float('-inf'), float('inf')]
+
+
+def test_cached_times_match_tv_list():
+    f = NumericStepfun([(3, 1), (None, 0), (1, 2)])
+    assert list(f._times) == [float('-inf'), 1.0, 3.0]
+    assert NumericStepfun(f)._times is f._times
+
+
+@pytest.mark.parametrize("f", funs)
+def test_eval_matches_naive(f):
+    for x in points:
+        assert f(x) == naive_eval(f, x)
+    for t, v in f.tv_list[1:]:
+        assert f(t) == v
+
+
+def test_eval_bool():
+    f = BoolStepfun([(None, False), (1, True), (3, False)])
+    assert [f(x) for x in (0, 1, 2, 3)] == [False, True, True, False]
+
+
+@pytest.mark.parametrize("f", funs)
+@pytest.mark.parametrize("window", [(-600, 600), (-3, 7), (0, 0), (12.5, 13), (-499, -498)])
+def test_integrate_matches_naive(f, window):
+    start, end = window
+    assert f.integrate(start, end) == pytest.approx(naive_integrate(f, start, end))
+
+
+def test_integrate_skips_non_numeric():
+    f = NumericStepfun([(None, 1), (0, "DIV/0"), (2, 3)])
+    assert f.integrate(-1, 3) == 1 + 3
+
+
+@pytest.mark.parametrize("f", funs)
+def test_evaluate_many_matches_call(f):
+    xs = points + sorted(points[:-2])
+    assert list(f.evaluate_many(xs)) == [f(x) for x in xs]
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_evaluate_many_sorted_and_unsorted(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(stepfun, "np", None)
+    elif stepfun.np is None:
+        pytest.skip("NumPy not installed")
+    f = NumericStepfun([(None, 1), (2, "DIV/0"), (3, 2.5)])
+    assert list(f.evaluate_many([0, 2, 2.5, 3, 10])) == [1, "DIV/0", "DIV/0", 2.5, 2.5]
+    assert list(f.evaluate_many([10, 0, 3, 2])) == [2.5, 1, 2.5, "DIV/0"]
+    g = BoolStepfun([(None, False), (1, True)])
+    assert list(g.evaluate_many([1, 0])) == [True, False]
+
+
+def test_evaluate_many_numpy_dtypes():
+    np = pytest.importorskip("numpy")
+    f = NumericStepfun([(None, 0.5), (1, 2.0)])
+    out = f.evaluate_many(np.array([0.0, 1.0, 5.0]))
+    assert out.dtype == np.float64 and out.tolist() == [0.5, 2.0, 2.0]
+    g = BoolStepfun([(None, False), (1, True)])
+    assert g.evaluate_many(np.array([0, 1])).dtype == np.bool_
+
+
+def test_evaluate_many_caches_values_and_accepts_scalar():
+    pytest.importorskip("numpy")
+    f = NumericStepfun([(None, 0.5), (1, 2.0)])
+    f.evaluate_many([0, 1])
+    cached = f._values
+    assert cached is not None
+    f.evaluate_many([3])
+    assert f._values is cached
+    assert f.evaluate_many(5).tolist() == [2.0]
+    big = NumericStepfun([(None, 0), (10 ** 18, 1)])
+    assert big.evaluate_many(10 ** 18).tolist() == [1]
+
+
+@pytest.mark.parametrize("tv", [
+    [(0, 1), (5, 1), (10, 2)],
+    [(None, 3), (0, 1), (0, 2), (0, 3), (4, 3), (4, 5)],
+    [("-oo", 1), (1, 2), (1, 1), (2, 1)],
+    [(1.5, True), (2, False), (2, True)],
+])
+def test_assume_sorted_matches_full_normalization(tv):
+    cls = BoolStepfun if isinstance(tv[0][1], bool) else NumericStepfun
+    f = cls(tv, assume_sorted=True)
+    assert f.tv_list == cls(tv).tv_list
+    assert list(f._times) == list(cls(tv)._times)
+
+
+def test_assume_sorted_validates():
+    with pytest.raises(ValueError):
+        NumericStepfun([(None, 1), (5, 2), (3, 1)], assume_sorted=True)
+    with pytest.raises(ValueError):
+        NumericStepfun([(0, 1), (None, 2)], assume_sorted=True)
+    with pytest.raises(ValueError):
+        NumericStepfun([], assume_sorted=True)
+    with pytest.raises(TypeError):
+        NumericStepfun([(None, 1), ("x", 2)], assume_sorted=True)
+
+
+def test_from_canonical_is_trusted():
+    tv = ((None, 0), (1, 2), (3, 0))
+    f = NumericStepfun._from_canonical(tv)
+    assert f.tv_list is tv and f == NumericStepfun(tv) and f(2) == 2
+
+
+def test_integrate_uses_prefix_index():
+    f = make_random_stepfun(50, seed=3)
+    assert f._prefix is None
+    f.integrate(-10, 10)
+    assert len(f._prefix) == len(f.tv_list)
+    assert f._prefix[-1] == pytest.approx(naive_integrate(f, f.tv_list[1][0], f.tv_list[-1][0]))
+
+
+def test_integrate_non_finite_values():
+    f = NumericStepfun([(None, 1), (0, float('inf')), (1, 2), (5, 3)])
+    assert f.integrate(2, 6) == 2 * 3 + 3
+    assert f.integrate(-2, 0.5) == float('inf')
+    g = NumericStepfun([(None, 1), (0, 2)]) + NumericStepfun([(None, 0), (10, float('inf'))])
+    assert g.integrate(-1, 1) == 3 and g.integrate(9, 11) == float('inf')
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("f", funs + [NumericStepfun([(None, 1), (0, "DIV/0"), (2, 3)])])
+def test_integrate_many_matches_integrate(monkeypatch, use_numpy, f):
+    if not use_numpy:
+        monkeypatch.setattr(stepfun, "np", None)
+    elif stepfun.np is None:
+        pytest.skip("NumPy not installed")
+    rnd = random.Random(5)
+    windows = [sorted((rnd.uniform(-600, 600), rnd.uniform(-600, 600))) for _ in range(200)]
+    windows += [(0, 0), (-1000, 1000), (3, 3.5)]
+    starts, ends = zip(*windows)
+    expected = [f.integrate(a, b) for a, b in windows]
+    assert list(f.integrate_many(starts, ends)) == pytest.approx(expected)
+
+
+def test_integrate_many_validates():
+    np = pytest.importorskip("numpy")
+    f = funs[2]
+    with pytest.raises(ValueError):
+        f.integrate_many(np.array([2.0]), np.array([1.0]))
+    with pytest.raises(ValueError):
+        f.integrate_many([1.0, 2.0], [3.0])
+
+
+def test_integrate_many_empty_windows_in_infinite_segments():
+    pytest.importorskip("numpy")
+    inf = float('inf')
+    for f in (NumericStepfun([(None, inf), (0, 1)]), NumericStepfun([(None, 1), (0, inf)])):
+        windows = [(-5, -5), (5, 5), (-5, 5), (-2, -1), (1, 2)]
+        starts, ends = zip(*windows)
+        assert list(f.integrate_many(starts, ends)) == [f.integrate(a, b) for a, b in windows]
+        assert f.integrate_many([-5, 5], [-5, 5]).tolist() == [0.0, 0.0]
+    f = funs[2]
+    f.integrate_many([0], [1])
+    cached = f._weights
+    assert cached is not None
+    f.integrate_many([2], [3])
+    assert f._weights is cached
+
+
+def random_events(n, seed, values=(0, 1, 2)):
+    # Ascending timestamps with many repeats and repeated values
+    rnd = random.Random(seed)
+    return [(t, rnd.choice(values)) for t in sorted(rnd.randint(0, n // 3) for _ in range(n))]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_from_events_matches_constructor(seed):
+    events = random_events(300, seed)
+    assert NumericStepfun.from_events(iter(events)).tv_list == NumericStepfun(events).tv_list
+    f = AbstractStepfun.from_events(iter(events))
+    assert isinstance(f, NumericStepfun) and f == NumericStepfun(events)
+    g = AbstractStepfun.from_events((t, v > 0) for t, v in events)
+    assert isinstance(g, BoolStepfun)
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_builder_chunks(size):
+    events = random_events(500, seed=size)
+    full = NumericStepfun(events)
+    chunks = list(StepfunBuilder.chunks(iter(events), size, NumericStepfun))
+    assert all(len(c.tv_list) <= size + 1 for c in chunks)
+    assert chunks[0].tv_list[0] == full.tv_list[0]
+    assert sum((c.tv_list[1:] for c in chunks), ()) == full.tv_list[1:]
+    for c, nxt in zip(chunks, chunks[1:] + [None]):
+        end = nxt.tv_list[1][0] if nxt is not None and len(nxt.tv_list) > 1 else 10 ** 6
+        for t, _ in c.tv_list[1:]:
+            assert c(t) == full(t) and c(end - 0.5) == full(end - 0.5)
+
+
+def test_builder_validates_order():
+    builder = StepfunBuilder()
+    builder.add(1, 2)
+    builder.add(1, 3)
+    with pytest.raises(ValueError):
+        builder.add(0, 1)
+    with pytest.raises(ValueError):
+        builder.add(None, 1)
+    assert builder.build().tv_list == NumericStepfun([(1, 2), (1, 3)]).tv_list == ((None, 2), (1, 3))
+    with pytest.raises(ValueError):
+        StepfunBuilder().build()
+
+
+@pytest.mark.parametrize("grid", [(-10, 10, 1), (0, 1, 0.1), (-3.3, 7.9, 0.05), (0, 0.3, 0.1), (5, 5, 1)])
+def test_scan_vectorized_matches_scalar(grid):
+    np = pytest.importorskip("numpy")
+    for scalar, vector in [
+        (lambda x: int(x >= 0), lambda x: (x >= 0).astype(int)),
+        (lambda x: math.floor(x / 2.5) * 0.5, lambda x: np.floor(x / 2.5) * 0.5),
+        (lambda x: x > 1, lambda x: x > 1),
+    ]:
+        try:
+            expected = AbstractStepfun.scan(scalar, *grid)
+        except ValueError:
+            with pytest.raises(ValueError):
+                AbstractStepfun.scan(vector, *grid, vectorized=True)
+            continue
+        f = AbstractStepfun.scan(vector, *grid, vectorized=True)
+        assert type(f) is type(expected) and f.tv_list == expected.tv_list
+
+
+def test_scan_vectorized_checks_shape():
+    pytest.importorskip("numpy")
+    with pytest.raises(ValueError):
+        AbstractStepfun.scan(lambda x: 1, 0, 10, 1, vectorized=True)
+
+
+@pytest.mark.parametrize("coarse", [1, 2, 5, 64, 10_000])
+@pytest.mark.parametrize("grid", [(-10, 10, 1), (0, 1, 0.1), (-3.3, 7.9, 0.05), (0, 0.3, 0.1)])
+def test_scan_adaptive_matches_scalar(grid, coarse):
+    for g in [lambda x: int(x >= 0), lambda x: math.floor(x / 2.5) * 0.5, lambda x: x > 1, lambda x: 7]:
+        expected = AbstractStepfun.scan(g, *grid)
+        f = AbstractStepfun.scan(g, *grid, adaptive=True, coarse=coarse)
+        assert type(f) is type(expected) and f.tv_list == expected.tv_list
+
+
+def test_scan_adaptive_saves_evaluations():
+    calls = []
+
+    def g(x):
+        calls.append(x)
+        return math.floor(x / 250)
+
+    f = AbstractStepfun.scan(g, 0, 1000, 0.01, adaptive=True, coarse=256)
+    assert f.tv_list == ((None, 0), (250.0, 1), (500.0, 2), (750.0, 3))
+    assert len(calls) < 1000
+    assert len(calls) == len(set(calls))
+    with pytest.raises(ValueError):
+        AbstractStepfun.scan(g, 0, 1, 0.1, adaptive=True, coarse=0)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("grid", [(-10, 10, 1), (0, 1, 0.1), (-3.3, 7.9, 0.05), (0, 0.3, 0.1), (0, 100, 0.01)])
+def test_scan_parallel_matches_scalar(grid, workers):
+    # Builtins are picklable, so they can be sent to the worker processes
+    for g in [math.floor, round, bool]:
+        expected = AbstractStepfun.scan(g, *grid)
+        f = AbstractStepfun.scan(g, *grid, workers=workers)
+        assert type(f) is type(expected) and f.tv_list == expected.tv_list
+
+
+def test_scan_parallel_validates():
+    with pytest.raises(ValueError):
+        AbstractStepfun.scan(math.floor, 0, 1, 0.1, workers=0)
+    with pytest.raises(ValueError):
+        AbstractStepfun.scan(math.floor, 0, 1, 0.1, adaptive=True, workers=2)
+    with pytest.raises(ValueError):
+        AbstractStepfun.scan(math.floor, 5, 5, 1, workers=2)
+
+
+def naive_restrict(f, a, b, fill):
+    return lambda x: f(x) if a <= x < b else fill
+
+
+@pytest.mark.parametrize("f", funs + [BoolStepfun([(None, False), (1, True), (3, False)])])
+@pytest.mark.parametrize("window", [(-600, 600), (-3, 7), (12.5, 13), (-499, -498), (0, 1), (1, 3)])
+@pytest.mark.parametrize("fill", [None, 0, False])
+def test_restrict_matches_naive(f, window, fill):
+    a, b = window
+    r = f.restrict(a, b, fill)
+    assert type(r) is type(f) and r.tv_list == type(f)(r.tv_list).tv_list
+    expected = naive_restrict(f, a, b, fill)
+    for x in points + [a, b, (a + b) / 2] + [t for t, _ in f.tv_list[1:]]:
+        assert r(x) == expected(x)
+    assert len(r.tv_list) <= len(f.tv_list) + 3
+
+
+def test_restrict_open_and_empty_windows():
+    f = NumericStepfun([(None, 1), (0, 2), (5, 3)])
+    assert f[:].tv_list == f.tv_list
+    assert f[:3].tv_list == ((None, 1), (0, 2), (3, None))
+    assert f[2:].tv_list == ((None, None), (2, 2), (5, 3))
+    assert f.restrict(4, 4, fill=0).tv_list == ((None, 0),)
+    assert f.restrict(-1, 10, fill=1).tv_list == ((None, 1), (0, 2), (5, 3), (10, 1))
+    with pytest.raises(TypeError):
+        f[1]
+    with pytest.raises(TypeError):
+        f[0:5:1]
+
+
+def naive_holds(f, g, op, is_valid):
+    # Pointwise over the merged breakpoints, the way comparisons used to be computed
+    ts = [float('-inf')] + sorted({t for t, _ in f.tv_list[1:]} | {t for t, _ in g.tv_list[1:]})
+    return all(is_valid(f(t)) and is_valid(g(t)) and op(f(t), g(t)) for t in ts)
+
+
+def is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_comparisons_match_naive(seed):
+    rnd = random.Random(seed)
+    values = [0, 1, 2, 2.5] + (["DIV/0"] if seed % 3 == 0 else [])
+
+    def make():
+        stamps = sorted(rnd.sample(range(-20, 20), rnd.randint(0, 12)))
+        return NumericStepfun([(None, rnd.choice(values))] + [(t, rnd.choice(values)) for t in stamps])
+
+    f, g = make(), make()
+    for h in [g, f, f + NumericStepfun([(None, 1)]), f.restrict(-5, 5, fill=-1)]:
+        for op in [operator.lt, operator.le, operator.gt, operator.ge]:
+            assert op(f, h) == naive_holds(f, h, op, is_number)
+        assert (f == h) == naive_holds(f, h, operator.eq, lambda v: True)
+        assert (f != h) == (not naive_holds(f, h, operator.eq, lambda v: True))
+    b1 = BoolStepfun([(t, v > 1) for t, v in f.tv_list if is_number(v)])
+    b2 = BoolStepfun([(t, v > 0) for t, v in g.tv_list if is_number(v)])
+    for op in [operator.lt, operator.le, operator.gt, operator.ge, operator.eq]:
+        assert op(b1, b2) == naive_holds(b1, b2, op, lambda v: isinstance(v, bool))
+
+
+def test_walk_visits_merged_intervals():
+    f = NumericStepfun([(None, 0), (1, 1), (3, 2)])
+    g = NumericStepfun([(None, 5), (1.0, 6), (2, 7), (float('inf'), 8)])
+    assert list(f._walk(g)) == [(0, 5), (1, 6), (1, 7), (2, 7), (2, 8)]
+    assert list(g._walk(f)) == [(5, 0), (6, 1), (7, 1), (7, 2), (8, 2)]
+
+
+def test_hash_consistent_with_eq():
+    f = make_random_stepfun(50, seed=3)
+    g = NumericStepfun(list(f.tv_list)[::-1])
+    assert f == g and f is not g and hash(f) == hash(g)
+    assert f._hash is not None and NumericStepfun(f)._hash == f._hash
+    assert len({f, g, f + NumericStepfun([(None, 0)]), f + NumericStepfun([(None, 1)])}) == 2
+    b = BoolStepfun([(None, False), (1, True)])
+    assert {b: 1}[BoolStepfun([(1, True), (None, False)])] == 1
+    with pytest.raises(TypeError):
+        hash(NumericStepfun([(None, [1, 2])]))
+
+
+def test_intern():
+    f = NumericStepfun([(None, 0), (1, 2)])
+    g = NumericStepfun([(1, 2), (None, 0)])
+    assert f.intern() is f and g.intern() is f
+    b = BoolStepfun([(None, True)])
+    assert b.intern() is b and NumericStepfun([(None, 1)]).intern() is not b
+
+
+def test_memoize_op():
+    calls = []
+
+    def add(x, y):
+        calls.append((x, y))
+        return x + y
+
+    cached = stepfun.memoize_op(add, maxsize=8)
+    f, g = funs[2], funs[3]
+    s = cached(f, g)
+    assert cached(NumericStepfun(f.tv_list), NumericStepfun(g.tv_list)) is s
+    assert s == f + g and len(calls) == 1
+    cached(g, f)
+    assert len(calls) == 2 and cached.cache_info().hits == 1
+    band = stepfun.memoize_op(operator.and_)
+    b = BoolStepfun([(None, False), (1, True)])
+    assert band(b, ~b) is band(b, ~b)
+
+
+def test_large_int_timestamps_stay_exact():
+    # Nanosecond epochs exceed 2**53 and would collapse in a float64 index
+    n = 10 ** 18
+    f = NumericStepfun([(None, 0), (n, 1), (n + 1, 2)])
+    g = NumericStepfun([(None, 0), (n + 1, 5)])
+    assert isinstance(f._times, list)
+    assert [f(n - 1), f(n), f(n + 1)] == [0, 1, 2]
+    assert (f + g).tv_list == ((None, 0), (n, 1), (n + 1, 7))
+    assert list(f.evaluate_many([n, n + 1])) == [1, 2]
+    assert f.integrate(n, n + 2) == 3 and list(f.integrate_many([n], [n + 2])) == [3]
+    assert not f <= g and f.restrict(n, n + 1, fill=0).tv_list == ((None, 0), (n, 1), (n + 1, 0))
+    assert isinstance(NumericStepfun([(None, 0), (2 ** 53, 1)])._times, stepfun.array)
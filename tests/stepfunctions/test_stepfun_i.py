@@ -0,0 +1,187 @@
+# project owner: Johannes Siedersleben
+#
+# Test driver for the N-ary sweep engine behind NumericStepfun._combine and
+# BoolStepfun._combine. Results of sum, multiply, logical_and/or/xor on many
+# random operands (including non-numeric values) are checked pointwise
+# against a naive left-to-right reduction.
+
+import functools
+import math
+import operator
+import random
+
+import pytest
+
+from sandbox.stepfunctions.stepfun import AbstractStepfun, NumericStepfun, BoolStepfun, _RunningSum
+
+
+def make_random_tv(rnd, n, values):
+    stamps = sorted(rnd.sample(range(-200, 200), n))
+    return [(None, rnd.choice(values))] + [(t, rnd.choice(values)) for t in stamps]
+
+
+def numeric_funs(k, seed, values=(-2, -1, 0, 1, 2, 3.5)):
+    rnd = random.Random(seed)
+    return [NumericStepfun(make_random_tv(rnd, rnd.randint(0, 15), values)) for _ in range(k)]
+
+
+def bool_funs(k, seed, values=(True, False)):
+    rnd = random.Random(seed)
+    return [BoolStepfun(make_random_tv(rnd, rnd.randint(0, 15), values)) for _ in range(k)]
+
+
+def probe_points(fs):
+    ts = {t for f in fs for t, _ in f.tv_list[1:]}
+    return [-1000] + sorted(ts | {t + 0.5 for t in ts})
+
+
+def naive(fs, op, is_valid, identity=None):
+    def at(x):
+        values = [f(x) for f in fs]
+        for v in values:
+            if not is_valid(v):
+                return v
+        return functools.reduce(op, values) if identity is None else functools.reduce(op, values, identity)
+
+    return at
+
+
+def is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def test_sweep_visits_union_of_breakpoints():
+    f = NumericStepfun([(None, 0), (1, 1), (3, 2)])
+    g = NumericStepfun([(None, 5), (1.0, 6), (2, 7)])
+    steps = [(t, list(current), sorted(i for i, _ in changed))
+             for t, current, changed in AbstractStepfun._sweep([f, g])]
+    assert steps == [(None, [0, 5], [0, 1]), (1, [1, 6], [0, 1]), (2, [1, 7], [1]), (3, [2, 7], [0])]
+
+
+@pytest.mark.parametrize("k", [1, 2, 7, 40])
+@pytest.mark.parametrize("op, identity", [(operator.add, 0), (operator.mul, 1)])
+def test_numeric_nary_matches_naive(k, op, identity):
+    fs = numeric_funs(k, seed=k, values=(-2, -1, 0, 1, 2, 3.5, "DIV/0", None))
+    result = NumericStepfun._combine(fs, op, identity)
+    expected = naive(fs, op, is_number, identity)
+    for x in probe_points(fs):
+        if is_number(expected(x)):
+            assert result(x) == pytest.approx(expected(x))
+        else:
+            assert result(x) == expected(x)
+
+
+@pytest.mark.parametrize("k", [1, 2, 7, 40])
+@pytest.mark.parametrize("op", [operator.and_, operator.or_, operator.xor])
+def test_bool_nary_matches_naive(k, op):
+    fs = bool_funs(k, seed=k, values=(True, False, True, False, None))
+    result = BoolStepfun._combine(fs, op)
+    expected = naive(fs, op, lambda v: isinstance(v, bool))
+    for x in probe_points(fs):
+        assert result(x) == expected(x)
+
+
+def test_logical_and_or_many():
+    fs = bool_funs(200, seed=7)
+    points = probe_points(fs)
+    conj = BoolStepfun.logical_and(*fs)
+    disj = BoolStepfun.logical_or(*fs)
+    for x in points:
+        assert conj(x) is all(f(x) for f in fs)
+        assert disj(x) is any(f(x) for f in fs)
+
+
+def test_running_sum_insert_remove_exact():
+    rnd = random.Random(3)
+    agg = _RunningSum()
+    live = []
+    for _ in range(2000):
+        if live and rnd.random() < 0.4:
+            agg.remove(live.pop(rnd.randrange(len(live))))
+        else:
+            x = rnd.choice([rnd.randint(-10, 10), rnd.uniform(-1e10, 1e10), rnd.uniform(-1e-5, 1e-5)])
+            agg.add(x)
+            live.append(x)
+        if any(isinstance(x, float) for x in live):
+            assert agg.value() == math.fsum(live)
+        else:
+            assert agg.value() == sum(live) and isinstance(agg.value(), int)
+
+
+def test_running_sum_non_finite():
+    agg = _RunningSum()
+    agg.add(1.5)
+    agg.add(math.inf)
+    assert agg.value() == math.inf
+    agg.add(-math.inf)
+    assert math.isnan(agg.value())
+    agg.remove(math.inf)
+    agg.remove(-math.inf)
+    assert agg.value() == 1.5
+
+
+def test_sum_thousands_of_functions():
+    fs = numeric_funs(1000, seed=11, values=(0.1, 0.2, 0.3, 1, 2))
+    s = NumericStepfun.sum(*fs)
+    for x in probe_points(fs)[::25]:
+        assert s(x) == math.fsum(f(x) for f in fs)
+
+
+def test_sum_floats_and_ints():
+    f = NumericStepfun([(None, 0.1), (10, 0.7), (20, 1)])
+    g = NumericStepfun([(None, 0.2), (10, -0.4), (20, 2)])
+    s = f + g
+    assert [s(0), s(10)] == [math.fsum([0.1, 0.2]), math.fsum([0.7, -0.4])]
+    assert s(20) == 3 and isinstance(s(20), int)
+    ints = NumericStepfun.sum(NumericStepfun([(None, 1), (3, 2)]), NumericStepfun([(None, 4)]))
+    assert ints.tv_list == ((None, 5), (3, 6)) and isinstance(ints(5), int)
+
+
+def test_sum_correctly_rounded_add_chained():
+    f, g, h = (NumericStepfun([(None, v)]) for v in (0.1, 0.2, 0.3))
+    assert NumericStepfun.sum(f, g, h)(0) == 0.6
+    assert (f + g + h)(0) == 0.1 + 0.2 + 0.3
+    assert (f + g).tv_list == NumericStepfun.sum(f, g).tv_list
+
+
+@pytest.mark.parametrize("k", [1, 2, 7, 40, 300])
+@pytest.mark.parametrize("op", [min, max])
+def test_minimum_maximum_match_naive(k, op):
+    fs = numeric_funs(k, seed=k, values=(-2, -1, 0, 1, 2, 3.5, 1.0, "DIV/0"))
+    result = (NumericStepfun.minimum if op is min else NumericStepfun.maximum)(*fs)
+    expected = naive(fs, op, is_number)
+    for x in probe_points(fs):
+        assert result(x) == expected(x)
+    assert result.tv_list == NumericStepfun(result.tv_list).tv_list
+
+
+def test_minimum_nan_dominates():
+    f = NumericStepfun([(None, 1.0), (0, math.nan), (1, 2.0)])
+    g = NumericStepfun([(None, 0.5)])
+    m = NumericStepfun.minimum(f, g)
+    assert m(-1) == 0.5 and math.isnan(m(0.5)) and m(2) == 0.5
+    assert NumericStepfun.maximum(f, g)(2) == 2.0
+
+
+def test_capacity_capping():
+    # min of demand and capacity across many assets, then summed
+    demand = numeric_funs(200, seed=5, values=(0, 10, 20, 30))
+    capacity = numeric_funs(200, seed=6, values=(5, 15, 25))
+    capped = [NumericStepfun.minimum(d, c) for d, c in zip(demand, capacity)]
+    total = NumericStepfun.sum(*capped)
+    for x in probe_points(demand + capacity)[::10]:
+        assert total(x) == sum(min(d(x), c(x)) for d, c in zip(demand, capacity))
+
+
+def test_map_and_clip():
+    f = NumericStepfun([(None, -3), (0, 1.5), (2, "DIV/0"), (4, 7), (6, 10)])
+    assert f.map(lambda v: v * 2).tv_list == ((None, -6), (0, 3.0), (2, "DIV/0"), (4, 14), (6, 20))
+    assert f.clip(0, 8).tv_list == ((None, 0), (0, 1.5), (2, "DIV/0"), (4, 7), (6, 8))
+    assert f.clip(hi=1).tv_list == ((None, -3), (0, 1), (2, "DIV/0"), (4, 1))
+    assert f.clip().tv_list == f.tv_list
+    with pytest.raises(ValueError):
+        f.clip(2, 1)
+    with pytest.raises(TypeError):
+        f.map(lambda v: v > 2)
+    with pytest.raises(TypeError):
+        f.map(str)
@@ -0,0 +1,103 @@
+# project owner: Johannes Siedersleben
+#
+# Test driver for the binary storage format (storage.py): round trips of
+# NumericStepfun, BoolStepfun and ArrayStepfun, memory-mapped loading and
+# rejection of malformed files.
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sandbox.stepfunctions import storage
+from sandbox.stepfunctions.stepfun import AbstractStepfun, NumericStepfun, BoolStepfun
+from sandbox.stepfunctions.arraystepfun import ArrayStepfun
+
+
+def random_tv(n, seed, values):
+    rnd = random.Random(seed)
+    stamps = sorted(rnd.sample(range(-10_000, 10_000), n))
+    return [(None, rnd.choice(values))] + [(t + rnd.choice([0, 0.5]), rnd.choice(values)) for t in stamps]
+
+
+@pytest.mark.parametrize("f", [
+    NumericStepfun(random_tv(1000, 1, [-3, 0, 2, 2 ** 40])),
+    NumericStepfun(random_tv(1000, 2, [-1.5, 0.25, 3, float('inf')])),
+    BoolStepfun(random_tv(1000, 3, [True, False])),
+    NumericStepfun([(None, 7)]),
+])
+def test_stepfun_round_trip(tmp_path, f):
+    path = tmp_path / "f.stf"
+    f.save(path)
+    g = AbstractStepfun.load(path)
+    assert type(g) is type(f) and g == f
+    assert type(f).load(path) == f
+    a = ArrayStepfun.load(path)
+    xs = np.linspace(-11_000, 11_000, 5001)
+    assert a.evaluate_many(xs).tolist() == pytest.approx(list(f.evaluate_many(xs.tolist())))
+
+
+def test_int_values_stay_int(tmp_path):
+    f = NumericStepfun([(None, 1), (2, 5), (3.5, -4)])
+    f.save(tmp_path / "f.stf")
+    g = NumericStepfun.load(tmp_path / "f.stf")
+    assert g.tv_list == f.tv_list and all(type(v) is int for _, v in g.tv_list)
+    mixed = NumericStepfun([(None, 1), (2, 0.5)])
+    mixed.save(tmp_path / "m.stf")
+    assert NumericStepfun.load(tmp_path / "m.stf").tv_list == ((None, 1.0), (2.0, 0.5))
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_array_stepfun_round_trip(tmp_path, mmap):
+    rnd = np.random.default_rng(4)
+    f = ArrayStepfun.from_arrays(np.cumsum(rnd.random(100_000)), rnd.integers(0, 5, 100_000))
+    f.save(tmp_path / "a.stf")
+    g = ArrayStepfun.load(tmp_path / "a.stf", mmap=mmap)
+    assert isinstance(g.times, np.memmap) is mmap
+    assert g == f and g(500.0) == f(500.0) and g.integrate(0, 1000) == f.integrate(0, 1000)
+    assert (g + f) == f * ArrayStepfun([(None, 2.0)])
+    b = ArrayStepfun.from_arrays(f.times, f.values > 2)
+    b.save(tmp_path / "b.stf")
+    assert BoolStepfun.load(tmp_path / "b.stf") == b.to_stepfun()
+
+
+def test_load_type_mismatch(tmp_path):
+    BoolStepfun([(None, True)]).save(tmp_path / "b.stf")
+    with pytest.raises(TypeError):
+        NumericStepfun.load(tmp_path / "b.stf")
+
+
+def test_save_rejects_non_numeric(tmp_path):
+    with pytest.raises(TypeError):
+        NumericStepfun([(None, 1), (2, "DIV/0")]).save(tmp_path / "x.stf")
+
+
+def test_load_rejects_bad_files(tmp_path):
+    path = tmp_path / "f.stf"
+    NumericStepfun([(None, 1.5), (2, 3.0)]).save(path)
+    data = path.read_bytes()
+    (tmp_path / "short.stf").write_bytes(data[:-1])
+    (tmp_path / "magic.stf").write_bytes(b"X" + data[1:])
+    (tmp_path / "empty.stf").write_bytes(b"")
+    for name in ["short.stf", "magic.stf", "empty.stf"]:
+        with pytest.raises(ValueError):
+            storage.load(tmp_path / name)
+        with pytest.raises(ValueError):
+            AbstractStepfun.load(tmp_path / name)
+
+
+def test_save_rejects_inexact_timestamps(tmp_path):
+    with pytest.raises(ValueError):
+        NumericStepfun([(None, 0), (10 ** 18 + 1, 1)]).save(tmp_path / "x.stf")
+
+
+def test_array_stepfun_rejects_inexact_timestamps():
+    f = NumericStepfun([(None, 0), (2 ** 60, 1), (2 ** 60 + 1, 2)])
+    with pytest.raises(ValueError):
+        ArrayStepfun(f)
+    with pytest.raises(ValueError):
+        ArrayStepfun.from_stepfun(f)
+    with pytest.raises(ValueError):
+        ArrayStepfun([(None, 0), (2 ** 60 + 1, 1)])
+    assert ArrayStepfun([(None, 0), (2 ** 53, 1)])(2 ** 53) == 1.0